@@ -0,0 +1,63 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from psycopg2 import Error
+
+from database_client import DatabaseClient, ConnectionPool
+from instruments import DEFAULT_ISIN
+
+
+class DatabaseError(Exception):
+    """A query failed, so its default result must not be mistaken for data."""
+
+
+class AsyncDatabaseClient:
+    """
+    Async front for DatabaseClient for use inside the FastAPI event loop.
+
+    psycopg2 calls block, so every query runs on a dedicated thread pool that is
+    no larger than the connection pool, and each call borrows a pooled connection
+    for its duration. The event loop only awaits the result.
+
+    Where DatabaseClient prints an error and returns a default, the calls here
+    raise DatabaseError instead.
+    """
+
+    def __init__(self, pool: ConnectionPool, max_workers: int = None):
+        self.pool = pool
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or pool.maxconn, thread_name_prefix="db")
+
+    def _call(self, method_name: str, args: tuple):
+        db = DatabaseClient(pool=self.pool)
+        try:
+            db.connect()
+        except Error as e:
+            raise DatabaseError(f"Could not borrow a database connection: {e}") from e
+        try:
+            result = getattr(db, method_name)(*args)
+        finally:
+            db.disconnect()
+        if db.last_error is not None:
+            raise DatabaseError(f"{method_name} failed: {db.last_error}") from db.last_error
+        return result
+
+    async def _run(self, method_name: str, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._call, method_name, args)
+
+    async def read_price_range(self, start_date: date, end_date: date, instrument: str = DEFAULT_ISIN):
+        """Read prices for a date range, inclusive."""
+        return await self._run("read_price_range", start_date, end_date, instrument)
+
+    async def read_all_prices(self, instrument: str = DEFAULT_ISIN):
+        """Retrieve all price entries of an instrument from the database."""
+        return await self._run("read_all_prices", instrument)
+
+    async def read_price_version(self) -> tuple:
+        """Return (latest price_date, row count)."""
+        return await self._run("read_price_version")
+
+    def shutdown(self):
+        """Wait for running queries and stop the worker threads."""
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,71 @@
+"""
+Compares the NumPy columnar reader with the per-row parse_stock_data path on
+generated tab-separated price files.
+
+Usage: python src/benchmarks/bench_columnar_reader.py [--rows 100000 1000000 10000000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from columnar_reader import read_stock_columns
+from file_reader import parse_stock_data
+
+
+def write_stock_file(path: str, rows: int):
+    """Write `rows` lines shaped like stock_data.txt, in batches to keep memory low."""
+    day = date(1990, 1, 1)
+    with open(path, 'w') as file:
+        batch = []
+        for i in range(rows):
+            price = f"{1000 + (i % 500) * 1.37:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+            batch.append(f"{day.strftime('%d.%m.%Y')}\t{price}\t{price}\t{price}\t{price}\t{i % 40}\n")
+            day += timedelta(days=1)
+            if day.year > 2200:
+                day = date(1990, 1, 1)
+            if len(batch) == 100000:
+                file.writelines(batch)
+                batch = []
+        file.writelines(batch)
+
+
+def timed(function, argument):
+    started = time.perf_counter()
+    result = function(argument)
+    return time.perf_counter() - started, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the per-row and columnar stock file readers")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--skip-legacy-above", type=int, default=2000000,
+                        help="Only time the columnar reader on files larger than this")
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'file MB':>8} {'per-row s':>10} {'numpy s':>9} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        for rows in args.rows:
+            path = os.path.join(directory, f"stock_{rows}.txt")
+            write_stock_file(path, rows)
+            size = os.path.getsize(path) / 1024 / 1024
+            current, columns = timed(read_stock_columns, path)
+            assert len(columns.closes) == rows
+            if rows > args.skip_legacy_above:
+                print(f"{rows:>10} {size:>8.1f} {'-':>10} {current:>9.3f} {'-':>8}")
+                continue
+            legacy, lists = timed(parse_stock_data, path)
+            assert np.array_equal(columns.closes, np.array(lists[4]))
+            assert np.array_equal(columns.volumes, np.array(lists[5]))
+            print(f"{rows:>10} {size:>8.1f} {legacy:>10.3f} {current:>9.3f} {legacy / current:>7.1f}x")
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
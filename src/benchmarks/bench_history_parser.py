@@ -0,0 +1,85 @@
+"""
+Compares the lxml history table parser with the previous BeautifulSoup
+implementation on generated pages of thousands of rows.
+
+Usage: python src/benchmarks/bench_history_parser.py [--rows 1000 10000 50000]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+
+from history_parser import parse_history_table
+
+
+def make_history_page(rows: int) -> bytes:
+    """Build a page shaped like the Börse Düsseldorf instrument page with `rows` history rows."""
+    body = []
+    day = date(2025, 9, 11)
+    for i in range(rows):
+        price = f"{1000 + (i % 500) * 1.37:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+        body.append(
+            f"<tr><td>{day.strftime('%d.%m.%Y')}</td><td>{price}</td><td>{price}</td>"
+            f"<td>{price}</td><td>{price}</td><td>{i % 40}</td></tr>"
+        )
+        day -= timedelta(days=1)
+    # Surrounding markup so the parsers have to skip a realistic amount of page
+    filler = "<div class='news'><p>Lorem ipsum dolor sit amet</p></div>" * 500
+    return (
+        "<html><head><meta charset='utf-8'><title>SwissOne</title></head><body>"
+        f"{filler}<div id='instrument-historie'><table class='kurs-table'><thead><tr>"
+        "<th>Datum</th><th>Erster</th><th>Hoch</th><th>Tief</th><th>Schluss [EUR]</th><th>Stück</th>"
+        f"</tr></thead><tbody>{''.join(body)}</tbody></table></div>{filler}</body></html>"
+    ).encode("utf-8")
+
+
+def legacy_parse(page: bytes) -> list:
+    """The previous extraction path: BeautifulSoup html.parser, header dicts, then string munging."""
+    soup = BeautifulSoup(page, 'html.parser')
+    table = soup.find('div', id='instrument-historie').find('table')
+    headers = [th.text.strip() for th in table.find('thead').find_all('th')]
+    rows = []
+    for tr in table.find('tbody').find_all('tr'):
+        cells = [td.text.strip() for td in tr.find_all('td')]
+        if len(cells) == len(headers):
+            rows.append(dict(zip(headers, cells)))
+    closes = [float(row['Schluss [EUR]'].replace('.', '').replace(',', '.')) for row in rows]
+    dates = []
+    for row in rows:
+        day, month, year = map(int, row['Datum'].split('.'))
+        dates.append(date(year, month, day))
+    return list(zip(dates, closes))
+
+
+def best_of(function, argument, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(argument)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the history table parsers")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'page KB':>8} {'bs4 s':>9} {'lxml s':>9} {'speedup':>8}")
+    for rows in args.rows:
+        page = make_history_page(rows)
+        parsed = parse_history_table(page)
+        assert [(row.date, row.close) for row in parsed] == legacy_parse(page)
+        legacy = best_of(legacy_parse, page, args.repeat)
+        current = best_of(parse_history_table, page, args.repeat)
+        print(f"{rows:>8} {len(page) // 1024:>8} {legacy:>9.4f} {current:>9.4f} {legacy / current:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
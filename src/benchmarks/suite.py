@@ -0,0 +1,448 @@
+"""
+Benchmark suite for the ingest and serving hot paths.
+
+Every scenario runs against local stand-ins only: synthetic price files, a
+generated instrument page served from a temporary directory, a stub FX server,
+a generated ECB rate file and the FastAPI app through an in-process ASGI client
+over an in-memory stub database. The database scenario writes to a dedicated
+local Postgres given by BENCH_DB_HOST/PORT/NAME/USER/PASSWORD, never the app's
+DB_* database, and is skipped when that is not set, reachable or migrated.
+
+Usage:
+    python src/benchmarks/suite.py run [--scenario NAME ...] [--rows 100000] [--output results.json]
+    python src/benchmarks/suite.py compare baseline.json results.json [--threshold 0.1]
+
+`compare` exits with status 1 when a scenario's throughput dropped, or its p99
+latency grew, by more than the threshold.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, SimpleHTTPRequestHandler, ThreadingHTTPServer
+from functools import partial
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = {}
+BENCH_INSTRUMENT = "XX0000000000"
+
+
+class SkipScenario(Exception):
+    """Raised by a scenario whose dependency (e.g. a database) is not available."""
+
+
+def scenario(name: str):
+    """Register a scenario function taking the parsed arguments and a work directory."""
+    def register(function):
+        SCENARIOS[name] = function
+        return function
+    return register
+
+
+def percentile(values, q: float) -> float:
+    """The q-th percentile (0..1) of values, by nearest rank."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q * len(ordered)) - 1))]
+
+
+def summarize(timings, items_per_op: int, **params) -> dict:
+    """Throughput and latency figures for a list of per-operation durations in seconds."""
+    total = sum(timings)
+    return {
+        "ops": len(timings),
+        "items": items_per_op * len(timings),
+        "seconds": round(total, 6),
+        "throughput": round(items_per_op * len(timings) / total, 3) if total else None,
+        "p50_ms": round(percentile(timings, 0.50) * 1000, 4),
+        "p99_ms": round(percentile(timings, 0.99) * 1000, 4),
+        "params": params,
+    }
+
+
+def measure(operation, count: int) -> list:
+    timings = []
+    for i in range(count):
+        started = time.perf_counter()
+        operation(i)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def serve(handler, directory: str = None) -> str:
+    """Serve `handler` on an ephemeral localhost port in a daemon thread; returns the base URL."""
+    if directory:
+        handler = partial(handler, directory=directory)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+class QuietFileHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class StubFXHandler(BaseHTTPRequestHandler):
+    """Answers Frankfurter (single day and time series) and Currencylayer requests with a fixed EUR to USD rate."""
+    single_day = json.dumps({"rates": {"USD": 1.1}, "quotes": {"EURUSD": 1.1}, "success": True}).encode()
+
+    def do_GET(self):
+        path = self.path.split("?")[0].strip("/")
+        if ".." in path:
+            start, end = (date.fromisoformat(part) for part in path.split(".."))
+            days = (start + timedelta(days=i) for i in range((end - start).days + 1))
+            body = json.dumps({"rates": {day.isoformat(): {"USD": 1.1} for day in days if day.weekday() < 5}}).encode()
+        else:
+            body = self.single_day
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@scenario("parse_stock_data")
+def bench_parse_stock_data(args, workdir):
+    from bench_columnar_reader import write_stock_file
+    from file_reader import parse_stock_data
+    path = os.path.join(workdir, f"stock_{args.rows}.txt")
+    if not os.path.exists(path):
+        write_stock_file(path, args.rows)
+    return summarize(measure(lambda i: parse_stock_data(path), args.repeat), args.rows, rows=args.rows)
+
+
+@scenario("read_stock_columns")
+def bench_read_stock_columns(args, workdir):
+    from bench_columnar_reader import write_stock_file
+    from columnar_reader import read_stock_columns
+    path = os.path.join(workdir, f"stock_{args.rows}.txt")
+    if not os.path.exists(path):
+        write_stock_file(path, args.rows)
+    return summarize(measure(lambda i: read_stock_columns(path), args.repeat), args.rows, rows=args.rows)
+
+
+@scenario("string_to_float")
+def bench_string_to_float(args, workdir):
+    from utility import string_to_float
+    rows = [{"Schluss [EUR]": f"{1000 + (i % 500) * 1.37:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")}
+            for i in range(args.rows)]
+    return summarize(measure(lambda i: string_to_float(rows), args.repeat), args.rows, rows=args.rows)
+
+
+@scenario("extract_historical_prices")
+def bench_extract_historical_prices(args, workdir):
+    from instruments import DEFAULT_INSTRUMENT
+    from web_scraper import extract_historical_prices
+    rows = len(extract_historical_prices(instrument=DEFAULT_INSTRUMENT) or [])
+    if not rows:
+        raise SkipScenario("the fixture page could not be parsed")
+    return summarize(measure(lambda i: extract_historical_prices(instrument=DEFAULT_INSTRUMENT), args.repeat),
+                     rows, rows=rows, fixture=args.fixture or "generated")
+
+
+LOCAL_DB_HOSTS = ("localhost", "127.0.0.1", "::1")
+
+
+@scenario("database_single_vs_bulk")
+def bench_database(args, workdir):
+    """
+    Single-row against bulk inserts and a range read on a dedicated, local benchmark
+    database given by BENCH_DB_*. The scenario deletes and inserts rows, so it never
+    uses the app's DB_* settings and refuses hosts other than localhost or a socket.
+    """
+    from dotenv import load_dotenv
+    from psycopg2 import Error
+    from database_client import DatabaseClient
+    load_dotenv()
+    host = os.getenv("BENCH_DB_HOST")
+    if not host:
+        raise SkipScenario("BENCH_DB_HOST is not set")
+    if host not in LOCAL_DB_HOSTS and not host.startswith("/"):
+        raise SkipScenario(f"BENCH_DB_HOST {host} is not local; the scenario only writes to a local database")
+    db = DatabaseClient(
+        host=host,
+        port=int(os.getenv("BENCH_DB_PORT", "5432")),
+        dbname=os.getenv("BENCH_DB_NAME", "swissone_bench"),
+        user=os.getenv("BENCH_DB_USER"),
+        password=os.getenv("BENCH_DB_PASSWORD"),
+        sslmode="allow"
+    )
+    try:
+        db.connect()
+    except Error as e:
+        raise SkipScenario(f"database not reachable: {e}")
+
+    def clear():
+        db.cursor.execute("DELETE FROM finance.daily_prices WHERE instrument = %s;", (BENCH_INSTRUMENT,))
+        db.connection.commit()
+
+    rows = [(date(2000, 1, 1) + timedelta(days=i), 1.1 * (100 + i % 50), 100.0 + i % 50) for i in range(args.db_rows)]
+    try:
+        try:
+            clear()
+        except Error as e:
+            db.connection.rollback()
+            raise SkipScenario(f"finance.daily_prices is missing or not migrated: {e}")
+        single = measure(lambda i: db.insert_price(rows[i][1], rows[i][2], rows[i][0], BENCH_INSTRUMENT), len(rows))
+        clear()
+        bulk = measure(lambda i: db.insert_prices_bulk(rows, instrument=BENCH_INSTRUMENT), 1)
+        reads = measure(lambda i: db.read_price_range(rows[0][0], rows[-1][0], BENCH_INSTRUMENT), args.repeat)
+        if db.last_error is not None:
+            raise SkipScenario(f"benchmark queries failed: {db.last_error}")
+        clear()
+    except Error as e:
+        db.connection.rollback()
+        raise SkipScenario(f"benchmark queries failed: {e}")
+    finally:
+        db.disconnect()
+    return {
+        "single_insert": summarize(single, 1, rows=len(rows)),
+        "bulk_insert": summarize(bulk, len(rows), rows=len(rows)),
+        "read_price_range": summarize(reads, len(rows), rows=len(rows)),
+    }
+
+
+@scenario("convert_eur_to_usd")
+def bench_convert_eur_to_usd(args, workdir):
+    from currency_convert import convert_eur_to_usd, convert_eur_to_usd_many
+    # Distinct past dates, so every call misses the rate cache and goes to the stub server
+    start = date(2001, 1, 1)
+    single = measure(lambda i: convert_eur_to_usd(100.0, start + timedelta(days=i)), args.fx_calls)
+    days = [start + timedelta(days=args.fx_calls + i) for i in range(args.fx_calls)]
+    many = measure(lambda i: convert_eur_to_usd_many([100.0] * len(days), days), 1)
+    return {
+        "single": summarize(single, 1, calls=args.fx_calls),
+        "many": summarize(many, len(days), calls=len(days)),
+    }
+
+
+class StubPriceDatabase:
+    """
+    Stands in for AsyncDatabaseClient with (price_date, price, price_eur) rows held
+    in memory, so the API scenario measures the app rather than Postgres.
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.dates = [row[0] for row in rows]
+        self.version = (self.dates[-1], len(rows))
+
+    async def read_price_version(self) -> tuple:
+        return self.version
+
+    async def read_price_range(self, start_date, end_date, instrument=None):
+        return self.rows[bisect_left(self.dates, start_date):bisect_right(self.dates, end_date)]
+
+
+@scenario("asgi_api_prices")
+def bench_asgi_api_prices(args, workdir):
+    """
+    GET /api/prices through an in-process ASGI client. ASGITransport does not run
+    the lifespan, so app.state.db is a StubPriceDatabase instead of the Postgres pool.
+    The dashboard cache is cleared before every render request, so "snapshot" and
+    "database" time a full payload build from each data source; "cached" times
+    repeated requests that the cache answers.
+    """
+    import httpx
+    import main
+    from instruments import DEFAULT_ISIN
+    from snapshot import write_snapshot
+
+    end = date(2025, 9, 12)
+    rows = [(end - timedelta(days=args.api_rows - 1 - i), 1.1 * (100 + i % 50), 100.0 + i % 50)
+            for i in range(args.api_rows)]
+    db = StubPriceDatabase(rows)
+    write_snapshot(DEFAULT_ISIN, rows, db.version)
+    main.app.state.db = db
+    params = {"instrument": DEFAULT_ISIN, "start": rows[0][0].isoformat(), "end": end.isoformat(), "max_points": 1000}
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            async def timed(render: bool) -> list:
+                timings = []
+                for _ in range(args.requests):
+                    if render:
+                        main.dashboard_cache.invalidate()
+                    started = time.perf_counter()
+                    response = await client.get("/api/prices", params=params, headers={"Accept-Encoding": "gzip"})
+                    response.raise_for_status()
+                    timings.append(time.perf_counter() - started)
+                return timings
+
+            snapshot = await timed(render=True)
+            # A version the snapshot was not written at makes the handler read the rows instead
+            db.version = (end, len(rows) + 1)
+            database = await timed(render=True)
+            cached = await timed(render=False)
+            return snapshot, database, cached
+
+    renders = {source: main.DASHBOARD_RENDER_SECONDS.labels(source=source).count for source in ("snapshot", "database")}
+    snapshot, database, cached = asyncio.run(run())
+    for source in renders:
+        # Each render part must have gone through its own data source
+        assert main.DASHBOARD_RENDER_SECONDS.labels(source=source).count - renders[source] == args.requests, source
+    return {
+        "snapshot": summarize(snapshot, 1, requests=args.requests, rows=args.api_rows),
+        "database": summarize(database, 1, requests=args.requests, rows=args.api_rows),
+        "cached": summarize(cached, 1, requests=args.requests, rows=args.api_rows),
+    }
+
+
+def write_ecb_csv(path: str, first: date, last: date):
+    """Write a file shaped like eurofxref-hist.csv (newest day first, trailing comma) with weekday rates."""
+    with open(path, "w") as file:
+        file.write("Date,USD,CHF,GBP,\n")
+        day = last
+        while day >= first:
+            if day.weekday() < 5:
+                file.write(f"{day.isoformat()},1.1,0.95,0.85,\n")
+            day -= timedelta(days=1)
+
+
+def prepare_environment(args, workdir: str):
+    """Point the code under test at local stand-ins; must run before the modules are imported."""
+    from bench_history_parser import make_history_page
+    from instruments import DEFAULT_INSTRUMENT
+
+    page_dir = os.path.join(workdir, "site", "etc", DEFAULT_INSTRUMENT.isin, DEFAULT_INSTRUMENT.slug)
+    os.makedirs(page_dir)
+    with open(os.path.join(page_dir, "index.html"), "wb") as file:
+        if args.fixture:
+            with open(args.fixture, "rb") as fixture:
+                file.write(fixture.read())
+        else:
+            file.write(make_history_page(args.page_rows))
+
+    ecb_path = os.path.join(workdir, "eurofxref-hist.csv")
+    write_ecb_csv(ecb_path, date(1999, 1, 4), date(2025, 9, 12))
+
+    fx_url = serve(StubFXHandler)
+    os.environ.update({
+        "BOERSE_URL": serve(QuietFileHandler, os.path.join(workdir, "site")),
+        "SCRAPE_HOST_INTERVAL": "0",
+        "FRANKFURTER_URL": fx_url,
+        "CURRENCYLAYER_URL": fx_url,
+        "FX_CACHE_PATH": os.path.join(workdir, "fx_rates.sqlite3"),
+        "SNAPSHOT_DIR": os.path.join(workdir, "snapshots"),
+        "ECB_CSV_PATH": ecb_path,
+        "ECB_TABLE_CACHE_PATH": os.path.join(workdir, "ecb_rates.npz"),
+    })
+    # instruments read BOERSE_URL at import time
+    import instruments
+    instruments.BOERSE_URL = os.environ["BOERSE_URL"]
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(args):
+    names = args.scenario or list(SCENARIOS)
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        prepare_environment(args, workdir)
+        for name in names:
+            print(f"{name} ...", flush=True)
+            try:
+                results[name] = SCENARIOS[name](args, workdir)
+            except SkipScenario as e:
+                results[name] = {"skipped": str(e)}
+            print(f"  {json.dumps(results[name])}", flush=True)
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"Results written to {args.output}")
+
+
+def flatten(results: dict) -> dict:
+    """Scenario figures keyed by 'scenario' or 'scenario.part' for scenarios with several parts."""
+    flat = {}
+    for name, result in results.items():
+        if "throughput" in result or "skipped" in result:
+            flat[name] = result
+        else:
+            for part, figures in result.items():
+                flat[f"{name}.{part}"] = figures
+    return flat
+
+
+def compare(args) -> int:
+    with open(args.baseline) as file:
+        baseline = flatten(json.load(file)["results"])
+    with open(args.current) as file:
+        current = flatten(json.load(file)["results"])
+
+    regressions = 0
+    print(f"{'scenario':<42} {'throughput':>22} {'change':>8} {'p99 ms':>20} {'change':>8}")
+    for name in sorted(set(baseline) & set(current)):
+        old, new = baseline[name], current[name]
+        if "skipped" in old or "skipped" in new:
+            print(f"{name:<42} skipped")
+            continue
+        throughput_change = new["throughput"] / old["throughput"] - 1
+        p99_change = new["p99_ms"] / old["p99_ms"] - 1 if old["p99_ms"] else 0.0
+        regressed = throughput_change < -args.threshold or p99_change > args.threshold
+        regressions += regressed
+        print(f"{name:<42} {old['throughput']:>10.1f} {new['throughput']:>11.1f} {throughput_change:>+8.1%} "
+              f"{old['p99_ms']:>9.3f} {new['p99_ms']:>10.3f} {p99_change:>+8.1%}{'  REGRESSION' if regressed else ''}")
+    for name in sorted(set(baseline) ^ set(current)):
+        print(f"{name:<42} only in {'baseline' if name in baseline else 'current'}")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark suite for the ingest and serving hot paths")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run scenarios and store the results as JSON")
+    run_parser.add_argument("--scenario", nargs="+", choices=sorted(SCENARIOS), help="Scenarios to run, default all")
+    run_parser.add_argument("--rows", type=int, default=100000, help="Rows of the synthetic price file (up to 10^7)")
+    run_parser.add_argument("--repeat", type=int, default=5, help="Repetitions of the bulk scenarios")
+    run_parser.add_argument("--page-rows", type=int, default=5000, help="History rows of the generated page")
+    run_parser.add_argument("--fixture", help="Saved instrument page to serve instead of a generated one")
+    run_parser.add_argument("--db-rows", type=int, default=1000)
+    run_parser.add_argument("--fx-calls", type=int, default=200)
+    run_parser.add_argument("--requests", type=int, default=500, help="Requests per part of the API scenario")
+    run_parser.add_argument("--api-rows", type=int, default=10000, help="Price rows served by the API scenario")
+    run_parser.add_argument("--output", default="benchmark_results.json")
+
+    compare_parser = commands.add_parser("compare", help="Compare two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.1,
+                                help="Allowed relative throughput drop or p99 growth, default 0.1")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args)
+    else:
+        sys.exit(compare(args))
+
+
+if __name__ == "__main__":
+    main()
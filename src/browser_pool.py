@@ -0,0 +1,134 @@
+import threading
+import time
+import logging
+from collections import deque
+from contextlib import contextmanager
+
+from metrics import Histogram, SLOW_LATENCY_BUCKETS
+
+logger = logging.getLogger(__name__)
+
+
+class PooledBrowser:
+    """A WebDriver together with its usage bookkeeping."""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.pages = 0
+        self.last_used = time.monotonic()
+
+
+class BrowserPool:
+    """
+    Bounded pool of warm WebDriver sessions.
+
+    At most `max_size` browsers exist at any time; borrowing blocks while they are
+    all in use. A browser is recycled after serving `max_pages` pages or sitting
+    idle for `max_idle` seconds, is health-checked before it is handed out, and is
+    discarded if the page it served raised an error. Idle browsers are reaped by a
+    daemon thread, started with the first warm browser, so Chrome does not linger
+    between scrapes that are hours apart.
+    """
+
+    def __init__(self, create_driver, max_size: int = 1, max_pages: int = 50, max_idle: float = 600):
+        self.create_driver = create_driver
+        self.max_size = max_size
+        self.max_pages = max_pages
+        self.max_idle = max_idle
+        self._idle = deque()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._reaper = None
+        self.created = 0
+        self.recycled = 0
+        self.start_latency = Histogram(SLOW_LATENCY_BUCKETS)
+
+    @contextmanager
+    def session(self):
+        """Borrow a browser for one page; yields the WebDriver."""
+        self._slots.acquire()
+        browser = None
+        try:
+            browser = self._checkout()
+            yield browser.driver
+            browser.pages += 1
+            browser.last_used = time.monotonic()
+            if browser.pages >= self.max_pages:
+                self._quit(browser, "served max pages")
+            else:
+                with self._lock:
+                    self._idle.append(browser)
+                self._start_reaper()
+            browser = None
+        finally:
+            if browser is not None:
+                self._quit(browser, "page failed")
+            self._slots.release()
+
+    def _checkout(self) -> PooledBrowser:
+        """Take a healthy idle browser, or start a new one."""
+        while True:
+            with self._lock:
+                browser = self._idle.pop() if self._idle else None
+            if browser is None:
+                break
+            if time.monotonic() - browser.last_used > self.max_idle:
+                self._quit(browser, "idle too long")
+            elif not self._is_healthy(browser):
+                self._quit(browser, "failed health check")
+            else:
+                return browser
+        started = time.perf_counter()
+        browser = PooledBrowser(self.create_driver())
+        self.created += 1
+        elapsed = time.perf_counter() - started
+        self.start_latency.observe(elapsed)
+        logger.info(f"Browser started in {elapsed:.2f}s")
+        return browser
+
+    def _is_healthy(self, browser: PooledBrowser) -> bool:
+        try:
+            return browser.driver.execute_script("return 1;") == 1
+        except Exception as e:
+            logger.warning(f"Browser health check failed: {e}")
+            return False
+
+    def _quit(self, browser: PooledBrowser, reason: str):
+        self.recycled += 1
+        logger.info(f"Closing browser after {browser.pages} pages: {reason}")
+        try:
+            browser.driver.quit()
+        except Exception as e:
+            logger.warning(f"Error closing browser: {e}")
+
+    def reap_idle(self) -> int:
+        """Quit the browsers that have been idle for longer than `max_idle`; returns how many."""
+        now = time.monotonic()
+        with self._lock:
+            expired = [browser for browser in self._idle if now - browser.last_used > self.max_idle]
+            self._idle = deque(browser for browser in self._idle if browser not in expired)
+        for browser in expired:
+            self._quit(browser, "idle too long")
+        return len(expired)
+
+    def _start_reaper(self):
+        with self._lock:
+            if self._reaper is not None:
+                return
+            self._reaper = threading.Thread(target=self._reap_forever, name="browser-reaper", daemon=True)
+        self._reaper.start()
+
+    def _reap_forever(self):
+        while True:
+            time.sleep(min(self.max_idle, 60))
+            try:
+                self.reap_idle()
+            except Exception as e:
+                logger.warning(f"Reaping idle browsers failed: {e}")
+
+    def close(self):
+        """Quit every idle browser."""
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for browser in idle:
+            self._quit(browser, "pool closed")
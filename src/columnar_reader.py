@@ -0,0 +1,149 @@
+import re
+import warnings
+from datetime import date
+from typing import NamedTuple
+
+import numpy as np
+
+from file_reader import ParseSummary
+
+# A well-formed line: DD.MM.YYYY, four German-formatted prices and an integer volume
+LINE_PATTERN = re.compile(
+    rb'^\d{2}\.\d{2}\.\d{4}(\t-?[\d.]+(,\d+)?){4}\t\d+$'
+)
+# Byte positions of YYYY, MM and DD inside a 'DD.MM.YYYY' date, in ISO order
+ISO_ORDER = [6, 7, 8, 9, 2, 3, 4, 5, 0, 1]
+NEWLINE, CARRIAGE_RETURN, DOT, TAB = b'\n'[0], b'\r'[0], b'.'[0], b'\t'[0]
+
+
+class StockColumns(NamedTuple):
+    dates: np.ndarray    # datetime64[D]
+    opens: np.ndarray    # float64
+    highs: np.ndarray    # float64
+    lows: np.ndarray     # float64
+    closes: np.ndarray   # float64
+    volumes: np.ndarray  # int64
+
+
+EMPTY = StockColumns(
+    np.empty(0, dtype='datetime64[D]'), *(np.empty(0, dtype=np.float64) for _ in range(4)),
+    np.empty(0, dtype=np.int64),
+)
+
+
+def _line_starts(buf: np.ndarray) -> np.ndarray:
+    """Offsets of the first byte of every non-empty line in a block."""
+    starts = np.flatnonzero(buf == NEWLINE) + 1
+    starts = np.concatenate(([0], starts[starts < len(buf)]))
+    return starts[(buf[starts] != NEWLINE) & (buf[starts] != CARRIAGE_RETURN)]
+
+
+def _parse_block_fast(block: bytes):
+    """
+    Parses a block of whole lines in bulk. Dates are taken straight from the bytes
+    at each line start; the rest of the block is normalized once ('.' dropped,
+    ',' turned into '.') and read as whitespace-separated numbers in C.
+    Returns None when the block is not perfectly regular.
+    """
+    buf = np.frombuffer(block, dtype=np.uint8)
+    starts = _line_starts(buf)
+    if not len(starts) or starts[-1] + 10 >= len(buf) or block.count(b'\t') != 5 * len(starts):
+        return None
+    # Every line must open with 'DD.MM.YYYY' followed by a tab
+    if not ((buf[starts + 2] == DOT) & (buf[starts + 5] == DOT) & (buf[starts + 10] == TAB)).all():
+        return None
+    iso = buf[starts[:, None] + ISO_ORDER]
+    iso[:, [4, 7]] = ord('-')
+    try:
+        dates = iso.view('S10').ravel().astype('datetime64[D]')
+        with warnings.catch_warnings():
+            # Trailing text numpy cannot read is reported as a warning; treat it as malformed
+            warnings.simplefilter('error')
+            numbers = np.fromstring(block.translate(None, b'.').replace(b',', b'.'), dtype=np.float64, sep=' ')
+    except (ValueError, DeprecationWarning):
+        return None
+    if numbers.size != 6 * len(starts):
+        return None
+    numbers = numbers.reshape(-1, 6)
+    volumes = numbers[:, 5]
+    if not (volumes == np.floor(volumes)).all():
+        return None
+    return StockColumns(
+        dates=dates,
+        opens=numbers[:, 1].copy(),
+        highs=numbers[:, 2].copy(),
+        lows=numbers[:, 3].copy(),
+        closes=numbers[:, 4].copy(),
+        volumes=volumes.astype(np.int64),
+    )
+
+
+def _parse_block_filtered(block: bytes, first_line: int, summary: ParseSummary) -> StockColumns:
+    """Keeps only well-formed lines of a block, then parses them in bulk."""
+    kept = []
+    for offset, line in enumerate(block.split(b'\n')):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            if not LINE_PATTERN.match(line):
+                raise ValueError(line)
+            # Rejects calendar-invalid dates such as 31.02
+            day, month, year = line[:10].split(b'.')
+            date(int(year), int(month), int(day))
+        except ValueError:
+            summary.record_malformed(first_line + offset)
+            continue
+        kept.append(line)
+    if not kept:
+        return EMPTY
+    return _parse_block_fast(b'\n'.join(kept) + b'\n')
+
+
+def read_stock_columns(file_path, summary=None, block_size: int = 64 * 1024 * 1024) -> StockColumns:
+    """
+    Reads a tab-separated stock data file into NumPy columns.
+
+    The file is processed in blocks of whole lines. A regular block is parsed in
+    bulk and reshaped to (-1, 6); a block with malformed lines falls back to
+    per-line filtering before the same bulk parse.
+
+    Args:
+        file_path (str): Path to the text file
+        summary (ParseSummary): Optional summary that receives row and malformed-line counts
+        block_size (int): Bytes read per block, bounding peak memory
+
+    Returns:
+        StockColumns: dates (datetime64[D]), opens/highs/lows/closes (float64), volumes (int64)
+    """
+    summary = summary if summary is not None else ParseSummary()
+    parts = []
+    first_line = 1
+    remainder = b''
+    with open(file_path, 'rb') as file:
+        while True:
+            chunk = file.read(block_size)
+            block = remainder + chunk
+            if chunk:
+                # Carry the trailing partial line over to the next block
+                cut = block.rfind(b'\n') + 1
+                block, remainder = block[:cut], block[cut:]
+            else:
+                remainder = b''
+            if block:
+                columns = _parse_block_fast(block)
+                if columns is None:
+                    columns = _parse_block_filtered(block, first_line, summary)
+                parts.append(columns)
+                first_line += block.count(b'\n')
+            if not chunk:
+                break
+
+    if not parts:
+        result = EMPTY
+    elif len(parts) == 1:
+        result = parts[0]
+    else:
+        result = StockColumns(*(np.concatenate(column) for column in zip(*parts)))
+    summary.rows += len(result.dates)
+    return result
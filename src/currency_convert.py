@@ -1,107 +1,68 @@
-import json
-import requests
-import os
-from dotenv import load_dotenv
 from datetime import datetime, date
 import logging
+from fx_cache import get_cache
+from fx_client import AsyncFXClient, run_sync
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Synchronous wrappers around fx_client.AsyncFXClient. They run on a shared background
+# event loop, so every call reuses the same keep-alive connection pool.
+
+def get_frankfurter_rate(date: date) -> float:
+    """Fetches the EUR to USD rate for a date using Frankfurter API."""
+    return run_sync(AsyncFXClient.get_frankfurter_rate, date)
+
+def get_frankfurter_rates(start: date, end: date) -> dict:
+    """
+    Fetches EUR to USD rates for every business day between start and end, inclusive,
+    with a single request to the Frankfurter time series endpoint.
+    Returns a date->rate mapping, empty if the request fails.
+    """
+    return run_sync(AsyncFXClient.get_frankfurter_rates, start, end)
+
 def get_frankfurter_conversion_rate(amount_eur: float, date: date) -> float:
     """Fetches conversion rate from EUR to USD using Frankfurter API."""
-    date_string = date.strftime("%Y-%m-%d")
-    url = f"https://api.frankfurter.app/{date_string}?from=EUR&to=USD"
-    
-    try:
-        response = requests.get(url, timeout=5)
-        response.raise_for_status()
-        data = response.json()
-        rate = data.get("rates", {}).get("USD")
-        if rate:
-            logger.info(f"Frankfurter API: Fetched rate {rate} for {date_string}")
-            return amount_eur * rate
-        logger.warning(f"Frankfurter API: No USD rate found for {date_string}")
-        return None
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Frankfurter API error for {date_string}: {e}")
-        return None
+    rate = get_frankfurter_rate(date)
+    if rate is not None:
+        return amount_eur * rate
+    return None
 
 def get_currencylayer_historical_rate(date: date) -> float:
     """Fetches historical conversion rate from EUR to USD using Currencylayer API."""
-    load_dotenv()
-    api_key = os.getenv("CURRENCYLAYER_API_KEY")
-    if not api_key:
-        logger.error("Currencylayer API key not found")
-        return None
-    
-    date_string = date.strftime("%Y-%m-%d")
-    url = f"https://api.currencylayer.com/historical?access_key={api_key}&date={date_string}&source=EUR&currencies=USD"
-    
-    try:
-        response = requests.get(url, timeout=5)
-        response.raise_for_status()
-        data = response.json()
-        if data.get("success"):
-            rate = data["quotes"]["EURUSD"]
-            logger.info(f"Currencylayer historical: Fetched rate {rate} for {date_string}")
-            return rate
-        logger.warning(f"Currencylayer historical API error: {data.get('error', {}).get('info', 'Unknown error')}")
-        return None
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Currencylayer historical error for {date_string}: {e}")
-        return None
+    return run_sync(AsyncFXClient.get_currencylayer_historical_rate, date)
 
 def get_currencylayer_live_rate() -> float:
     """Fetches live conversion rate from EUR to USD using Currencylayer API."""
-    load_dotenv()
-    api_key = os.getenv("CURRENCYLAYER_API_KEY")
-    if not api_key:
-        logger.error("Currencylayer API key not found")
-        return None
-    
-    url = f"https://api.currencylayer.com/live?access_key={api_key}&source=EUR&currencies=USD"
-    
-    try:
-        response = requests.get(url, timeout=5)
-        response.raise_for_status()
-        data = response.json()
-        if data.get("success"):
-            rate = data["quotes"]["EURUSD"]
-            logger.info(f"Currencylayer live: Fetched rate {rate}")
-            return rate
-        logger.warning(f"Currencylayer live API error: {data.get('error', {}).get('info', 'Unknown error')}")
-        return None
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Currencylayer live error: {e}")
-        return None
+    return run_sync(AsyncFXClient.get_currencylayer_live_rate)
+
+def get_eur_to_usd_rate(date: date) -> float:
+    """
+    Returns the EUR to USD rate for a date, checking the local rate cache
+    before falling back through the providers. Returns None if all attempts fail.
+    """
+    return run_sync(AsyncFXClient.get_eur_to_usd_rate, date)
 
 def convert_eur_to_usd(amount_eur: float, date: date) -> float:
     """
     Converts EUR to USD using multiple APIs with fallback strategy.
     Returns the converted amount or None if all attempts fail.
     """
-    # Try Frankfurter API first
-    result = get_frankfurter_conversion_rate(amount_eur, date)
-    if result is not None:
-        return result
-    
-    logger.warning(f"Falling back to Currencylayer historical rate for {date.strftime('%Y-%m-%d')}")
-    # Fallback to Currencylayer historical rate
-    rate = get_currencylayer_historical_rate(date)
-    if rate is not None:
-        return amount_eur * rate
-    
-    # If the date is today, try Currencylayer live rate as a last resort
-    if date.date() == datetime.today().date():
-        logger.warning("Falling back to Currencylayer live rate")
-        rate = get_currencylayer_live_rate()
-        if rate is not None:
-            return amount_eur * rate
-    
-    logger.error(f"Failed to fetch conversion rate for {date.strftime('%Y-%m-%d')}")
-    return None
+    return run_sync(AsyncFXClient.convert_eur_to_usd, amount_eur, date)
+
+def convert_eur_to_usd_many(amounts, dates) -> list:
+    """
+    Converts many EUR amounts to USD, one date per amount.
+    Dates missing from the local rate cache are fetched with a single time series
+    request; weekends and holidays take the rate of the last business day before them.
+    Returns a list of converted amounts, with None where no rate could be found.
+    """
+    return run_sync(AsyncFXClient.convert_eur_to_usd_many, amounts, dates)
+
+def cache_stats() -> dict:
+    """Returns hit/miss counters of the local FX rate cache."""
+    return get_cache().stats()
 
 if __name__ == "__main__":
     amount = 100
@@ -110,4 +71,4 @@ if __name__ == "__main__":
     if result is not None:
         print(f"{amount} EUR on {today.strftime('%Y-%m-%d')} = {result:.2f} USD")
     else:
-        print(f"Could not convert {amount} EUR on {today.strftime('%Y-%m-%d')}")
\ No newline at end of file
+        print(f"Could not convert {amount} EUR on {today.strftime('%Y-%m-%d')}")
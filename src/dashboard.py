@@ -0,0 +1,423 @@
+import gzip
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
+import numpy as np
+from downsample import downsample_prices, lttb_indices
+
+# Currencies the dashboard shows; prices are stored in EUR and USD, the rest are ECB cross rates
+CURRENCIES = ("usd", "eur", "chf", "gbp")
+CROSS_CURRENCIES = ("chf", "gbp")
+
+DASHBOARD_HTML = """
+    <!DOCTYPE html>
+<html lang="en">
+  <head>
+    <meta charset="UTF-8" />
+    <meta name="viewport" content="width=device-width, initial-scale=1.0" />
+    <title>Price Chart</title>
+    <script src="https://cdn.tailwindcss.com"></script>
+    <script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
+    <style>
+      body {
+        font-family: 'Roboto', sans-serif;
+        background: linear-gradient(135deg, #0f0f0f, #1e1e1e);
+        color: white;
+      }
+      canvas {
+        max-width: 100%;
+        height: 100%;
+      }
+    </style>
+  </head>
+  <body>
+    <div class="container mx-auto px-4 py-8 max-w-5xl">
+      <!-- Heading Section -->
+      <div class="mb-2 text-center sm:text-left">
+        <h1 class="text-3xl sm:text-4xl font-bold text-red-500 tracking-tight mb-2">
+          Price Chart
+        </h1>
+        <p class="text-gray-300 text-sm sm:text-base">
+          Chart showing recent closing prices
+        </p>
+      </div>
+
+      <div class='mb-4 text-center sm:text-left'>
+        <div class="flex items-baseline space-x-4">
+            <h2 id="mostRecentPrice" class="text-3xl font-semibold">$0.00</h2>
+            <h3 id="performanceChange">0%</h3>
+        </div>
+        <h2 id="mostRecentDate" class="text-sm text-gray-400">2023-01-01</h2>
+      </div>
+
+      <div class="flex flex-col sm:flex-row sm:items-center sm:justify-between mb-4">
+        <div class="mb-4 text-center sm:text-left">
+            <select id="instrumentSelect" class="p-2 rounded-lg bg-gray-800 text-white border border-gray-700 mr-2"></select>
+            <input type="date" id="startDate" min="2025-01-01" class="p-2 rounded-lg bg-gray-800 text-white border border-gray-700 mr-2" />
+            <input type="date" id="endDate" class="p-2 rounded-lg bg-gray-800 text-white border border-gray-700 mr-2" />
+            <button id="filterButton" class="bg-red-500 hover:bg-red-600 text-white py-1 px-4 rounded-lg transition duration-200">
+            Apply
+            </button>
+        </div>
+
+        <!-- Button Section -->
+        <div class="mb-4 text-center sm:text-left">
+            <button
+            id="toggleCurrency"
+            class="bg-transparent border-2 border-red-500 hover:bg-red-500 text-white py-1 px-2 rounded-lg transition duration-200"
+            >
+            Switch to EUR
+            </button>
+        </div>
+       </div>
+
+      <!-- Chart Card -->
+      <div
+        class="bg-[#1a1a1a] p-6 rounded-2xl shadow-xl h-[500px] flex items-center justify-center"
+      >
+        <canvas id="priceChart"></canvas>
+      </div>
+    </div>
+
+      <script>
+        const ctx = document.getElementById('priceChart').getContext('2d');
+        let performance = 0;
+        const currencySymbols = { usd: '$', eur: '€', chf: 'CHF ', gbp: '£' };
+        const currencyColors = {
+          usd: ['#F44336', 'rgba(244, 67, 54, 0.2)'],
+          eur: ['#3B82F6', 'rgba(59, 130, 246, 0.2)'],
+          chf: ['#10B981', 'rgba(16, 185, 129, 0.2)'],
+          gbp: ['#F59E0B', 'rgba(245, 158, 11, 0.2)']
+        };
+        let currencies = ['usd', 'eur'];
+        let currency = 'usd';
+        // About one point per pixel; the server downsamples longer ranges to this size
+        const maxPoints = Math.max(100, Math.round(document.getElementById('priceChart').clientWidth));
+
+        let currentLabels = [];
+        let currentValues = { usd: [], eur: [] };
+
+        async function loadInstruments() {
+          const response = await fetch('/api/instruments');
+          const select = document.getElementById('instrumentSelect');
+          for (const instrument of await response.json()) {
+            select.add(new Option(instrument.name, instrument.isin));
+          }
+        }
+
+        async function loadPrices(startDate, endDate) {
+          const instrument = document.getElementById('instrumentSelect').value;
+          const params = new URLSearchParams({ max_points: maxPoints });
+          if (instrument) params.set('instrument', instrument);
+          if (startDate) params.set('start', startDate);
+          if (endDate) params.set('end', endDate);
+          const response = await fetch(`/api/prices?${params}`);
+          if (!response.ok) {
+            // Keep the current chart when the prices cannot be read, e.g. a 503 while the database is down
+            const error = await response.json().catch(() => ({}));
+            throw new Error(error.detail || `Loading prices failed with status ${response.status}`);
+          }
+          return response.json();
+        }
+
+        function nextCurrency() {
+          return currencies[(currencies.indexOf(currency) + 1) % currencies.length];
+        }
+
+        function showChartData(data) {
+          currentLabels = data.labels;
+          // Cross-rate views are only present when the server has ECB rates
+          currencies = Object.keys(currencySymbols).filter((code) => data[`${code}_values`]);
+          if (!currencies.includes(currency)) currency = 'usd';
+          currentValues = {};
+          for (const code of currencies) currentValues[code] = data[`${code}_values`];
+
+          priceChart.data.labels = currentLabels;
+          priceChart.data.datasets[0].data = currentValues[currency];
+          priceChart.update();
+          document.getElementById('toggleCurrency').textContent = `Switch to ${nextCurrency().toUpperCase()}`;
+        }
+
+        function formatPrice(value) {
+          // Days without a price in this currency come through as null
+          return value == null ? 'n/a' : `${currencySymbols[currency]}${value.toFixed(2)}`;
+        }
+
+        function calculatePerformance() {
+          const values = currentValues[currency].filter((value) => value != null);
+          const initialPrice = values[0];
+          const mostRecentPrice = values[values.length - 1];
+          performance = ((mostRecentPrice - initialPrice) / initialPrice) * 100;
+          
+          let symbol = performance >= 0 ? '+' : '';
+          const performanceElement = document.getElementById('performanceChange');
+          performanceElement.textContent = `${symbol}${performance.toFixed(2)}%`;
+          performanceElement.style.color = performance >= 0 ? '#4CAF50' : '#F44336';
+
+        }
+
+        async function filterChartData(startDate, endDate) {
+          // Update the chart with the data of the selected range
+          showChartData(await loadPrices(startDate, endDate));
+        }
+
+        const chartConfig = {
+          type: 'line',
+          data: {
+            labels: currentLabels,
+            datasets: [
+              {
+                label: 'Closing Price (USD)',
+                data: currentValues.usd,
+                borderColor: '#F44336',
+                backgroundColor: 'rgba(244, 67, 54, 0.2)',
+                fill: true,
+                tension: 0,
+                pointRadius: 1,
+                pointHoverRadius: 4,
+                pointBackgroundColor: '#3B82F6',
+                pointBorderColor: '#fff',
+                pointBorderWidth: 1
+              }
+            ]
+          },
+          options: {
+            responsive: true,
+            maintainAspectRatio: false,
+            plugins: {
+              tooltip: {
+                backgroundColor: '#111827',
+                titleColor: '#facc15',
+                bodyColor: '#f5f5f5',
+                borderColor: '#3B82F6',
+                borderWidth: 1,
+                padding: 10
+              }
+            },
+            scales: {
+              x: {
+                title: {
+                  display: true,
+                  text: 'Date',
+                  color: '#f5f5f5',
+                  font: {
+                    weight: 'bold'
+                  }
+                },
+                ticks: {
+                  color: '#d1d5db'
+                },
+                grid: {
+                  color: 'rgba(255,255,255,0.05)'
+                }
+              },
+              y: {
+                title: {
+                  display: true,
+                  text: 'Closing Price (USD)',
+                  color: '#f5f5f5',
+                  font: {
+                    weight: 'bold'
+                  }
+                },
+                ticks: {
+                  color: '#d1d5db'
+                },
+                grid: {
+                  color: 'rgba(255,255,255,0.1)'
+                }
+              }
+            }
+          }
+        };
+
+        const priceChart = new Chart(ctx, chartConfig);
+
+        function loadInstrument() {
+          return loadPrices().then((chartData) => {
+            showChartData(chartData);
+            const mostRecentPrice = chartData[`most_recent_price_${currency}`];
+            document.getElementById('mostRecentPrice').textContent = formatPrice(mostRecentPrice);
+            document.getElementById('mostRecentDate').textContent = `${chartData.most_recent_date}`;
+            calculatePerformance(); // <-- Calculate and display performance on load
+          });
+        }
+
+        loadInstruments().then(loadInstrument);
+        document.getElementById('instrumentSelect').addEventListener('change', loadInstrument);
+
+        document.getElementById('filterButton').addEventListener('click', () => {
+            const startDate = document.getElementById('startDate').value;
+            const endDate = document.getElementById('endDate').value;
+            if (startDate && endDate) {
+            // Call a function to filter the chart data based on the selected dates
+            filterChartData(startDate, endDate).then(calculatePerformance);
+            }
+        });
+          document.getElementById('toggleCurrency').addEventListener('click', () => {
+              currency = nextCurrency();
+              const dataset = priceChart.data.datasets[0];
+              const label = `Closing Price (${currency.toUpperCase()})`;
+
+              dataset.data = currentValues[currency];  // ✅ uses filtered data if available
+              dataset.label = label;
+              [dataset.borderColor, dataset.backgroundColor] = currencyColors[currency];
+              priceChart.options.scales.y.title.text = label;
+              const values = currentValues[currency];
+              if (values.length) {
+                document.getElementById('mostRecentPrice').textContent = formatPrice(values[values.length - 1]);
+              }
+              document.getElementById('toggleCurrency').textContent = `Switch to ${nextCurrency().toUpperCase()}`;
+              calculatePerformance(); // <-- Update performance on currency switch
+              priceChart.update();
+          });
+      </script>
+  </body>
+</html>
+"""
+
+
+def price_series(rows, max_points: int) -> dict:
+    """
+    Build the chart payload for (price_date, price, price_eur) rows,
+    downsampled to at most `max_points` points.
+    """
+    total_points = len(rows)
+    rows = downsample_prices(rows, max_points)
+    dates = [str(v[0]) for v in rows]
+    price_usd = [float(v[1]) if v[1] is not None else None for v in rows]
+    price_eur = [float(v[2]) if v[2] is not None else None for v in rows]
+
+    return {
+        "labels": dates,
+        "usd_values": price_usd,
+        "eur_values": price_eur,
+        "most_recent_date": dates[-1] if dates else None,
+        "most_recent_price_usd": price_usd[-1] if dates else None,
+        "most_recent_price_eur": price_eur[-1] if dates else None,
+        "total_points": total_points
+    }
+
+
+def price_series_from_arrays(dates, price_usd, price_eur, max_points: int) -> dict:
+    """
+    Build the same chart payload as price_series from snapshot columns
+    (datetime64[D] dates, float64 USD and EUR prices, NaN where a price is missing).
+    """
+    total_points = len(dates)
+    if total_points > max_points:
+        # Pick points on the EUR series when some days have no USD price
+        shape = price_eur if np.isnan(price_usd).any() else price_usd
+        indices = lttb_indices(dates.astype(np.int64).tolist(), np.nan_to_num(shape).tolist(), max_points)
+        dates, price_usd, price_eur = dates[indices], price_usd[indices], price_eur[indices]
+    labels = np.datetime_as_string(dates, unit="D").tolist()
+    # NaN is not valid JSON
+    usd_values = [value if value == value else None for value in price_usd.tolist()]
+    eur_values = [value if value == value else None for value in price_eur.tolist()]
+
+    return {
+        "labels": labels,
+        "usd_values": usd_values,
+        "eur_values": eur_values,
+        "most_recent_date": labels[-1] if labels else None,
+        "most_recent_price_usd": usd_values[-1] if labels else None,
+        "most_recent_price_eur": eur_values[-1] if labels else None,
+        "total_points": total_points
+    }
+
+
+def add_currency_views(series: dict, fx_table, currencies=CROSS_CURRENCIES) -> dict:
+    """
+    Add `<currency>_values` and `most_recent_price_<currency>` for each of `currencies`
+    to a chart payload, converting its EUR values with ECB cross rates in one array operation.
+    """
+    dates = np.array(series["labels"], dtype="datetime64[D]")
+    converted = fx_table.convert_many(series["eur_values"], dates, [currency.upper() for currency in currencies])
+    for currency in currencies:
+        # NaN is not valid JSON; a day before the first ECB quote has no value
+        values = [value if value == value else None for value in converted[currency.upper()].tolist()]
+        series[f"{currency}_values"] = values
+        series[f"most_recent_price_{currency}"] = values[-1] if values else None
+    return series
+
+
+@dataclass
+class CachedResponse:
+    """A response body with its precomputed gzip form and ETag."""
+    body: bytes
+    gzipped: bytes
+    etag: str
+    media_type: str
+
+    @classmethod
+    def build(cls, content: str, media_type: str) -> "CachedResponse":
+        body = content.encode("utf-8")
+        return cls(
+            body=body,
+            gzipped=gzip.compress(body),
+            etag=f'"{hashlib.sha1(body).hexdigest()}"',
+            media_type=media_type
+        )
+
+
+class DashboardCache:
+    """
+    In-process cache of dashboard responses, keyed on request parameters and
+    valid for one data version such as (latest price_date, row count).
+
+    Within `revalidate_after` seconds of the last version check cached responses
+    are served without touching the database at all; after that the caller looks
+    up the current data version and passes it to `get()`, which drops every entry
+    once the version changes. The ingest job calls `invalidate()` after writing
+    new prices.
+    """
+
+    def __init__(self, revalidate_after: float = 60, max_entries: int = 256):
+        self.revalidate_after = revalidate_after
+        self.max_entries = max_entries
+        self._version = None
+        self._checked_at = None
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def fresh(self, key) -> CachedResponse:
+        """Returns the cached response if the data version was checked recently, otherwise None."""
+        checked_at = self._checked_at
+        if checked_at is None or time.monotonic() - checked_at >= self.revalidate_after:
+            return None
+        return self._entries.get(key)
+
+    def get(self, version: tuple, key) -> CachedResponse:
+        """Records a version check and returns the response cached for it, if any."""
+        with self._lock:
+            if version != self._version:
+                self._version = version
+                self._entries = {}
+            self._checked_at = time.monotonic()
+            return self._entries.get(key)
+
+    def put(self, version: tuple, key, response: CachedResponse) -> CachedResponse:
+        """Stores a response rendered from data at `version` and returns it."""
+        with self._lock:
+            if version == self._version:
+                if len(self._entries) >= self.max_entries:
+                    # Evict the oldest entry
+                    self._entries.pop(next(iter(self._entries)))
+                self._entries[key] = response
+        return response
+
+    def invalidate(self):
+        """Drop every cached response so the next request reads from the database."""
+        with self._lock:
+            self._version = None
+            self._checked_at = None
+            self._entries = {}
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Check an If-None-Match request header against an ETag."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
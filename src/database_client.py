@@ -1,22 +1,151 @@
 import psycopg2
 from psycopg2 import Error
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
 from datetime import date
+from instruments import DEFAULT_ISIN
+from fx_table import get_fx_table
+from metrics import REGISTRY
+import functools
+import threading
+import time
+
+QUERY_SECONDS = REGISTRY.histogram("db_query_duration_seconds", "Duration of DatabaseClient queries", ("query",))
+QUERY_ROWS = REGISTRY.counter("db_query_rows_total", "Rows returned or written by DatabaseClient queries", ("query",))
+
+
+def timed_query(rows=None):
+    """
+    Record the duration of a DatabaseClient method, labelled with its name, and
+    the row count `rows(result)` when given. The labelled children are bound once
+    here, so each call only adds two clock reads and a histogram update.
+    """
+    def decorate(method):
+        seconds = QUERY_SECONDS.labels(query=method.__name__)
+        row_count = QUERY_ROWS.labels(query=method.__name__) if rows is not None else None
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            started = time.perf_counter()
+            result = method(self, *args, **kwargs)
+            seconds.observe(time.perf_counter() - started)
+            if row_count is not None and result is not None:
+                row_count.inc(rows(result))
+            return result
+        return wrapper
+    return decorate
+
+class ConnectionPool:
+    """
+    Process-wide pool of PostgreSQL connections shared by DatabaseClient instances.
+
+    Borrowing blocks while all `maxconn` connections are in use. A connection that
+    has been idle for longer than `health_check_interval` seconds is checked with
+    `SELECT 1` before it is handed out and replaced if it is dead.
+    """
+
+    def __init__(self, host, port, dbname, user, password, sslmode="allow",
+                 minconn=1, maxconn=10, health_check_interval=30):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.health_check_interval = health_check_interval
+        self._pool = ThreadedConnectionPool(
+            minconn,
+            maxconn,
+            host=host,
+            port=port,
+            dbname=dbname,
+            user=user,
+            password=password,
+            sslmode=sslmode
+        )
+        self._available = threading.BoundedSemaphore(maxconn)
+        self._returned_at = {}
+        print(f"Database connection pool created ({minconn}-{maxconn} connections).")
+
+    def getconn(self):
+        """
+        Borrow a healthy connection from the pool.
+
+        Dead connections are closed and the next one is checked, until one passes
+        or `maxconn + 1` have been tried, so a pool full of connections dropped by
+        a server restart still ends with a freshly opened one.
+        """
+        self._available.acquire()
+        try:
+            for _ in range(self.maxconn + 1):
+                connection = self._pool.getconn()
+                if self._is_healthy(connection):
+                    return connection
+                self._returned_at.pop(id(connection), None)
+                self._pool.putconn(connection, close=True)
+            raise psycopg2.OperationalError(f"No healthy database connection after {self.maxconn + 1} attempts")
+        except Exception:
+            self._available.release()
+            raise
+
+    def putconn(self, connection):
+        """Return a borrowed connection to the pool, discarding it if it is broken."""
+        close = bool(connection.closed)
+        if not close:
+            try:
+                # Never hand out a connection in the middle of a transaction
+                connection.rollback()
+            except Error:
+                close = True
+        if close:
+            self._returned_at.pop(id(connection), None)
+        else:
+            self._returned_at[id(connection)] = time.monotonic()
+        self._pool.putconn(connection, close=close)
+        self._available.release()
+
+    def _is_healthy(self, connection) -> bool:
+        """Check a connection that has been idle for a while before reusing it."""
+        if connection.closed:
+            return False
+        returned_at = self._returned_at.get(id(connection))
+        if returned_at is not None and time.monotonic() - returned_at < self.health_check_interval:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1;")
+            connection.rollback()
+            return True
+        except Error as e:
+            print(f"Discarding unhealthy pooled connection: {e}")
+            return False
+
+    def closeall(self):
+        """Close every connection in the pool."""
+        self._pool.closeall()
+        print("Database connection pool closed.")
 
 class DatabaseClient:
-    def __init__(self, host, port, dbname, user, password, sslmode="allow"):
-        """Initialize the database connection."""
+    def __init__(self, host=None, port=None, dbname=None, user=None, password=None, sslmode="allow", pool=None):
+        """
+        Initialize the database connection.
+        When a ConnectionPool is given, connect() borrows from it and disconnect() returns to it.
+        """
         self.host = host
         self.port = port
         self.dbname = dbname
         self.user = user
         self.password = password
         self.sslmode = sslmode
+        self.pool = pool
         self.connection = None
         self.cursor = None
+        # The psycopg2 error of the last failed query; the methods return a default instead of raising
+        self.last_error = None
         
 
     def connect(self):
         """Establish a connection to the PostgreSQL database."""
+        if self.pool is not None:
+            self.connection = self.pool.getconn()
+            self.cursor = self.connection.cursor()
+            return
         try:
             self.connection = psycopg2.connect(
                 host=self.host,
@@ -29,6 +158,7 @@ class DatabaseClient:
             self.cursor = self.connection.cursor()
             print("Database connection established.")
         except Error as e:
+            self.last_error = e
             print(f"Error connecting to database: {e}")
             raise
 
@@ -36,30 +166,71 @@ class DatabaseClient:
         """Close the database connection."""
         if self.cursor:
             self.cursor.close()
+            self.cursor = None
         if self.connection:
-            self.connection.close()
-            print("Database connection closed.")
+            if self.pool is not None:
+                self.pool.putconn(self.connection)
+            else:
+                self.connection.close()
+                print("Database connection closed.")
+            self.connection = None
 
-    def insert_price(self, price: float, price_eur: float, price_date: date):
+    @timed_query()
+    def insert_price(self, price: float, price_eur: float, price_date: date, instrument: str = DEFAULT_ISIN):
         """Insert a new price for a given date"""
         try:
             query = """
-            INSERT INTO finance.daily_prices (price_date, price, price_eur)
-            VALUES (%s, %s, %s)
-            ON CONFLICT (price_date) DO NOTHING;
+            INSERT INTO finance.daily_prices (instrument, price_date, price, price_eur)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (instrument, price_date) DO NOTHING;
             """
-            self.cursor.execute(query, (price_date, price, price_eur))
+            self.cursor.execute(query, (instrument, price_date, price, price_eur))
             self.connection.commit()
             print(f"Inserted/Updated price {price} for date {price_date}.")
         except Error as e:
+            self.last_error = e
             print(f"Error inserting price: {e}")
             self.connection.rollback()
 
-    def read_price(self, price_date: date):
+    @timed_query(rows=lambda result: result[0])
+    def insert_prices_bulk(self, rows, instrument: str = DEFAULT_ISIN, page_size: int = 1000):
+        """
+        Insert many (price_date, price, price_eur) rows of an instrument in a single transaction.
+        Rows whose date already exists are skipped.
+
+        Returns:
+            tuple: (inserted, skipped) row counts
+
+        Raises:
+            psycopg2.Error: After rolling back, so a failed batch is not mistaken for one without new rows
+        """
+        rows = [(instrument, *row) for row in rows]
+        if not rows:
+            return 0, 0
+        try:
+            query = """
+            INSERT INTO finance.daily_prices (instrument, price_date, price, price_eur)
+            VALUES %s
+            ON CONFLICT (instrument, price_date) DO NOTHING
+            RETURNING price_date;
+            """
+            inserted = execute_values(self.cursor, query, rows, page_size=page_size, fetch=True)
+            self.connection.commit()
+            skipped = len(rows) - len(inserted)
+            print(f"Bulk inserted {len(inserted)} prices, skipped {skipped} existing dates.")
+            return len(inserted), skipped
+        except Error as e:
+            self.last_error = e
+            print(f"Error bulk inserting prices: {e}")
+            self.connection.rollback()
+            raise
+
+    @timed_query()
+    def read_price(self, price_date: date, instrument: str = DEFAULT_ISIN):
         """Read the price for a given date"""
         try:
-            query = "SELECT price FROM finance.daily_prices WHERE price_date = %s;"
-            self.cursor.execute(query, (price_date,))
+            query = "SELECT price FROM finance.daily_prices WHERE instrument = %s AND price_date = %s;"
+            self.cursor.execute(query, (instrument, price_date))
             result = self.cursor.fetchone()
             if result:
                 return result[0]
@@ -67,39 +238,112 @@ class DatabaseClient:
                 print(f"No price found for date {price_date}.")
                 return None
         except Error as e:
+            self.last_error = e
             print(f"Error reading price: {e}")
             return None
 
-    def read_price_range(self, start_date: date, end_date: date):
+    @timed_query(rows=len)
+    def read_price_range(self, start_date: date, end_date: date, instrument: str = DEFAULT_ISIN):
         """Read prices for a date range, inclusive."""
         try:
             query = """
                 SELECT price_date, price, price_eur
                 FROM finance.daily_prices
-                WHERE price_date BETWEEN %s AND %s
+                WHERE instrument = %s AND price_date BETWEEN %s AND %s
                 ORDER BY price_date;
             """
-            self.cursor.execute(query, (start_date, end_date))
+            self.cursor.execute(query, (instrument, start_date, end_date))
             return self.cursor.fetchall()
         except Error as e:
+            self.last_error = e
             print(f"Error reading price range: {e}")
             return []
 
-    def read_all_prices(self):
-        """Retrieve all price entries from the database."""
+    def read_price_range_in(self, start_date: date, end_date: date, currencies=("USD",), instrument: str = DEFAULT_ISIN):
+        """
+        Read prices for a date range, inclusive, converted from price_eur into each of
+        `currencies` (e.g. "CHF", "GBP") with ECB cross rates in one array operation.
+
+        Returns:
+            tuple: (dates, {currency: numpy array of prices})
+        """
+        rows = self.read_price_range(start_date, end_date, instrument)
+        dates = [row[0] for row in rows]
+        prices_eur = [float(row[2]) for row in rows]
+        return dates, get_fx_table().convert_many(prices_eur, dates, currencies)
+
+    @timed_query()
+    def read_latest_price_date(self, instrument: str = DEFAULT_ISIN):
+        """Return the most recent price_date of an instrument, or None if it has no prices."""
+        try:
+            query = "SELECT max(price_date) FROM finance.daily_prices WHERE instrument = %s;"
+            self.cursor.execute(query, (instrument,))
+            return self.cursor.fetchone()[0]
+        except Error as e:
+            self.last_error = e
+            print(f"Error reading latest price date: {e}")
+            return None
+
+    @timed_query(rows=len)
+    def read_latest_price_dates(self) -> dict:
+        """Return the most recent price_date of every stored instrument."""
+        try:
+            query = "SELECT instrument, max(price_date) FROM finance.daily_prices GROUP BY instrument;"
+            self.cursor.execute(query)
+            return dict(self.cursor.fetchall())
+        except Error as e:
+            self.last_error = e
+            print(f"Error reading latest price dates: {e}")
+            return {}
+
+    @timed_query()
+    def read_price_version(self) -> tuple:
+        """Return (latest price_date, row count), which changes whenever prices are added."""
+        try:
+            query = "SELECT max(price_date), count(*) FROM finance.daily_prices;"
+            self.cursor.execute(query)
+            return tuple(self.cursor.fetchone())
+        except Error as e:
+            self.last_error = e
+            print(f"Error reading price version: {e}")
+            return None, 0
+
+    @timed_query(rows=len)
+    def read_price_dates(self, start_date: date, end_date: date, instrument: str = DEFAULT_ISIN) -> set:
+        """Return the set of dates that have a price entry in a date range, inclusive."""
+        try:
+            query = """
+                SELECT price_date
+                FROM finance.daily_prices
+                WHERE instrument = %s AND price_date BETWEEN %s AND %s;
+            """
+            self.cursor.execute(query, (instrument, start_date, end_date))
+            return {row[0] for row in self.cursor.fetchall()}
+        except Error as e:
+            self.last_error = e
+            print(f"Error reading price dates: {e}")
+            return set()
+
+    @timed_query(rows=len)
+    def read_all_prices(self, instrument: str = DEFAULT_ISIN):
+        """Retrieve all price entries of an instrument from the database."""
         try:
             query = """
                 SELECT price_date, price, price_eur
                 FROM finance.daily_prices
+                WHERE instrument = %s
                 ORDER BY price_date;
             """
-            self.cursor.execute(query)
+            self.cursor.execute(query, (instrument,))
             return self.cursor.fetchall()
         except Error as e:
+            self.last_error = e
             print(f"Error reading all prices: {e}")
             return []
     
-    def update_price(self, price_date: date, price: float = None, price_eur: float = None):
+    @timed_query()
+    def update_price(self, price_date: date, price: float = None, price_eur: float = None,
+                     instrument: str = DEFAULT_ISIN):
         """Update price and/or price_eur for a given date."""
         try:
             fields = []
@@ -116,23 +360,120 @@ class DatabaseClient:
             query = f"""
                 UPDATE finance.daily_prices
                 SET {', '.join(fields)}
-                WHERE price_date = %s;
+                WHERE instrument = %s AND price_date = %s;
             """
+            values.append(instrument)
             values.append(price_date)
             self.cursor.execute(query, tuple(values))
             self.connection.commit()
             print(f"Updated price entry for date {price_date}.")
         except Error as e:
+            self.last_error = e
             print(f"Error updating price: {e}")
             self.connection.rollback()
 
-    def price_exists(self, price_date: date) -> bool:
+    @timed_query(rows=int)
+    def update_prices(self, prices, instrument: str = DEFAULT_ISIN) -> int:
+        """
+        Set the USD price of an instrument from (price_date, price) pairs with a single
+        UPDATE ... FROM (VALUES ...) statement in one transaction. Pairs without a
+        price are left out. Returns the number of rows updated.
+        """
+        prices = [(instrument, price_date, price) for price_date, price in prices if price is not None]
+        if not prices:
+            return 0
+        try:
+            query = """
+                UPDATE finance.daily_prices AS p
+                SET price = v.price
+                FROM (VALUES %s) AS v(instrument, price_date, price)
+                WHERE p.instrument = v.instrument AND p.price_date = v.price_date;
+            """
+            # One page, so the whole update is a single statement and rowcount covers every row
+            execute_values(self.cursor, query, prices, template="(%s, %s::date, %s::numeric)", page_size=len(prices))
+            updated = self.cursor.rowcount
+            self.connection.commit()
+            return updated
+        except Error as e:
+            self.last_error = e
+            print(f"Error updating prices: {e}")
+            self.connection.rollback()
+            return 0
+
+    @timed_query(rows=int)
+    def update_fx_rates(self, fx_rates) -> int:
+        """
+        Set EURtoUSD_fx_rate of every instrument from (price_date, fx_rate) pairs
+        with a single UPDATE ... FROM (VALUES ...) statement in one transaction.
+        Returns the number of rows updated.
+        """
+        fx_rates = list(fx_rates)
+        if not fx_rates:
+            return 0
+        try:
+            query = """
+                UPDATE finance.daily_prices AS p
+                SET EURtoUSD_fx_rate = v.fx_rate
+                FROM (VALUES %s) AS v(price_date, fx_rate)
+                WHERE p.price_date = v.price_date;
+            """
+            # One page, so the whole update is a single statement and rowcount covers every row
+            execute_values(self.cursor, query, fx_rates, template="(%s::date, %s)", page_size=len(fx_rates))
+            updated = self.cursor.rowcount
+            self.connection.commit()
+            return updated
+        except Error as e:
+            self.last_error = e
+            print(f"Error updating FX rates: {e}")
+            self.connection.rollback()
+            return 0
+
+    @timed_query(rows=int)
+    def recompute_usd_prices(self) -> int:
+        """
+        Recompute price as price_eur * EURtoUSD_fx_rate on the server for every row
+        that has both, in one statement. Returns the number of rows updated.
+        """
+        try:
+            query = """
+                UPDATE finance.daily_prices
+                SET price = price_eur * EURtoUSD_fx_rate
+                WHERE price_eur IS NOT NULL AND EURtoUSD_fx_rate IS NOT NULL;
+            """
+            self.cursor.execute(query)
+            updated = self.cursor.rowcount
+            self.connection.commit()
+            return updated
+        except Error as e:
+            self.last_error = e
+            print(f"Error recomputing USD prices: {e}")
+            self.connection.rollback()
+            return 0
+
+    @timed_query()
+    def count_missing_fx_rates(self) -> int:
+        """Count rows lacking price_eur or EURtoUSD_fx_rate."""
+        try:
+            query = """
+                SELECT count(*) FROM finance.daily_prices
+                WHERE price_eur IS NULL OR EURtoUSD_fx_rate IS NULL;
+            """
+            self.cursor.execute(query)
+            return self.cursor.fetchone()[0]
+        except Error as e:
+            self.last_error = e
+            print(f"Error counting missing FX rates: {e}")
+            return 0
+
+    @timed_query()
+    def price_exists(self, price_date: date, instrument: str = DEFAULT_ISIN) -> bool:
         """Check if a price entry exists for the given date."""
         try:
-            query = "SELECT 1 FROM finance.daily_prices WHERE price_date = %s LIMIT 1;"
-            self.cursor.execute(query, (price_date,))
+            query = "SELECT 1 FROM finance.daily_prices WHERE instrument = %s AND price_date = %s LIMIT 1;"
+            self.cursor.execute(query, (instrument, price_date))
             return self.cursor.fetchone() is not None
         except Error as e:
+            self.last_error = e
             print(f"Error checking if price exists: {e}")
             return False
 
@@ -0,0 +1,58 @@
+def lttb_indices(xs, ys, threshold: int) -> list:
+    """
+    Selects the indices of at most `threshold` points that preserve the visual shape
+    of a series, using the Largest-Triangle-Three-Buckets algorithm.
+
+    Args:
+        xs (list): Numeric x values in ascending order (e.g. date ordinals)
+        ys (list): Numeric y values, same length as xs
+        threshold (int): Maximum number of points to keep, at least 3
+
+    Returns:
+        list: Ascending indices into xs/ys; the first and last point are always kept
+    """
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+
+    indices = [0]
+    bucket_size = (n - 2) / (threshold - 2)
+    selected = 0
+    for bucket in range(threshold - 2):
+        start = int(bucket * bucket_size) + 1
+        end = int((bucket + 1) * bucket_size) + 1
+
+        # Average of the next bucket is the third corner of the triangle
+        next_start = end
+        next_end = min(int((bucket + 2) * bucket_size) + 1, n)
+        count = next_end - next_start
+        avg_x = sum(xs[next_start:next_end]) / count
+        avg_y = sum(ys[next_start:next_end]) / count
+
+        ax, ay = xs[selected], ys[selected]
+        best_area = -1.0
+        best = start
+        for i in range(start, end):
+            area = abs((ax - avg_x) * (ys[i] - ay) - (ax - xs[i]) * (avg_y - ay))
+            if area > best_area:
+                best_area = area
+                best = i
+        indices.append(best)
+        selected = best
+
+    indices.append(n - 1)
+    return indices
+
+
+def downsample_prices(rows, max_points: int) -> list:
+    """
+    Downsample (price_date, price, price_eur) rows to at most `max_points` rows.
+    Points are chosen on the USD series and the EUR values of the same days are kept;
+    the EUR series is used instead when some days have no USD price.
+    """
+    if len(rows) <= max_points:
+        return list(rows)
+    xs = [row[0].toordinal() for row in rows]
+    column = 2 if any(row[1] is None for row in rows) else 1
+    ys = [float(row[column]) if row[column] is not None else 0.0 for row in rows]
+    return [rows[i] for i in lttb_indices(xs, ys, max_points)]
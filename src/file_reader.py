@@ -1,16 +1,110 @@
-from datetime import datetime
+from datetime import date
+from models import PriceRow
+
+
+class ParseSummary:
+    """Counts of parsed and skipped lines, filled in while a file is streamed."""
+
+    def __init__(self):
+        self.rows = 0
+        self.malformed = 0
+        self.malformed_lines = []  # line numbers of the first few malformed lines
+
+    def record_malformed(self, line_number: int, max_examples: int = 10):
+        self.malformed += 1
+        if len(self.malformed_lines) < max_examples:
+            self.malformed_lines.append(line_number)
+
+    def __str__(self):
+        text = f"{self.rows} rows parsed, {self.malformed} malformed lines skipped"
+        if self.malformed_lines:
+            text += f" (first at lines {', '.join(map(str, self.malformed_lines))})"
+        return text
+
+
+def normalize_number(number_str):
+    """Converts a number string (e.g., '1.000,00' or '1000,00') to float."""
+    # Replace period with nothing and comma with period for float conversion
+    cleaned = number_str.replace('.', '').replace(',', '.')
+    return float(cleaned)
+
+
+def parse_date(date_str):
+    """Converts a 'DD.MM.YYYY' string to a date."""
+    day, month, year = date_str.split('.')
+    return date(int(year), int(month), int(day))
+
+
+def iter_stock_data(file_path, summary=None):
+    """
+    Streams a tab-separated stock data file as typed rows, one line at a time,
+    so memory stays flat regardless of file size.
+
+    Args:
+        file_path (str): Path to the text file
+        summary (ParseSummary): Optional summary that receives row and malformed-line counts
+
+    Yields:
+        PriceRow: (date, open, high, low, close, volume) per valid line
+    """
+    summary = summary if summary is not None else ParseSummary()
+    with open(file_path, 'r') as file:
+        for line_number, line in enumerate(file, start=1):
+            # Split the line by tabs, skipping empty lines
+            columns = line.strip().split('\t')
+            if columns == ['']:
+                continue
+
+            # Ensure we have the expected number of columns
+            if len(columns) != 6:
+                summary.record_malformed(line_number)
+                continue
+
+            try:
+                row = PriceRow(
+                    date=parse_date(columns[0]),
+                    open=normalize_number(columns[1]),
+                    high=normalize_number(columns[2]),
+                    low=normalize_number(columns[3]),
+                    close=normalize_number(columns[4]),
+                    # Volume should be an integer, no decimal formatting
+                    volume=int(columns[5])
+                )
+            except ValueError:
+                summary.record_malformed(line_number)
+                continue
+
+            summary.rows += 1
+            yield row
+
+
+def iter_stock_data_chunks(file_path, chunk_size=10000, summary=None):
+    """
+    Streams a stock data file as lists of at most `chunk_size` PriceRow entries,
+    ready to be handed to a bulk loader batch by batch.
+    """
+    chunk = []
+    for row in iter_stock_data(file_path, summary):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
 
 def parse_stock_data(file_path):
     """
     Reads a tab-separated stock data file and returns each column as a list.
     Handles number formats like 1.000,00 or 1000,00 by normalizing to float.
-    
+    Use iter_stock_data to stream large files instead.
+
     Args:
         file_path (str): Path to the text file
-        
+
     Returns:
         tuple: (dates, opens, highs, lows, closes, volumes)
-            - dates: List of datetime objects
+            - dates: List of date strings in 'DD.MM.YYYY' format
             - opens, highs, lows, closes: Lists of float values
             - volumes: List of integer values
     """
@@ -20,58 +114,25 @@ def parse_stock_data(file_path):
     lows = []
     closes = []
     volumes = []
-    
-    def normalize_number(number_str):
-        """Converts a number string (e.g., '1.000,00' or '1000,00') to float."""
-        # Replace period with nothing and comma with period for float conversion
-        cleaned = number_str.replace('.', '').replace(',', '.')
-        return float(cleaned)
-    
+    summary = ParseSummary()
+
     try:
-        with open(file_path, 'r') as file:
-            for line in file:
-                # Skip empty lines
-                if not line.strip():
-                    continue
-                    
-                # Split the line by tabs
-                columns = line.strip().split('\t')
-                
-                # Ensure we have the expected number of columns
-                if len(columns) != 6:
-                    print(f"Warning: Skipping malformed line: {line.strip()}")
-                    continue
-                
-                try:
-                    # Parse date (format: DD.MM.YYYY)
-                    date = columns[0]
-                    
-                    # Parse prices using normalize_number
-                    open_price = normalize_number(columns[1])
-                    high_price = normalize_number(columns[2])
-                    low_price = normalize_number(columns[3])
-                    close_price = normalize_number(columns[4])
-                    
-                    # Parse volume (should be an integer, no decimal formatting)
-                    volume = int(columns[5])
-                    
-                    # Append to respective lists
-                    dates.append(date)
-                    opens.append(open_price)
-                    highs.append(high_price)
-                    lows.append(low_price)
-                    closes.append(close_price)
-                    volumes.append(volume)
-                    
-                except ValueError as e:
-                    print(f"Warning: Error parsing line: {line.strip()}. Error: {e}")
-                    continue
-                    
+        for row in iter_stock_data(file_path, summary):
+            # Append to respective lists
+            dates.append(row.date.strftime('%d.%m.%Y'))
+            opens.append(row.open)
+            highs.append(row.high)
+            lows.append(row.low)
+            closes.append(row.close)
+            volumes.append(row.volume)
     except FileNotFoundError:
         print(f"Error: File {file_path} not found")
         return None
     except Exception as e:
         print(f"Error: An unexpected error occurred: {e}")
         return None
-        
+
+    if summary.malformed:
+        print(f"Warning: {summary}")
+
     return dates, opens, highs, lows, closes, volumes
@@ -0,0 +1,126 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, datetime
+import logging
+
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fx_rates.sqlite3")
+LIVE_RATE_TTL_SECONDS = 15 * 60
+
+FX_CACHE_LOOKUPS = REGISTRY.counter("fx_cache_lookups_total", "FX rate cache lookups by result", ("result",))
+FX_CACHE_HITS = FX_CACHE_LOOKUPS.labels(result="hit")
+FX_CACHE_MISSES = FX_CACHE_LOOKUPS.labels(result="miss")
+
+
+def as_date(value) -> date:
+    """Normalizes a date or datetime to a plain date."""
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+class FXRateCache:
+    """
+    Persistent store of FX rates keyed by (date, currency pair).
+
+    A rate fetched after its date ended is final and kept forever. A rate fetched
+    on or before its own date (today's live rate) is only trusted for `live_ttl`
+    seconds, after which it counts as a miss and is fetched again.
+    """
+
+    def __init__(self, path: str = None, live_ttl: int = LIVE_RATE_TTL_SECONDS):
+        self.path = path or os.getenv("FX_CACHE_PATH", DEFAULT_CACHE_PATH)
+        self.live_ttl = live_ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS fx_rates (
+                rate_date TEXT NOT NULL,
+                pair TEXT NOT NULL,
+                rate REAL NOT NULL,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (rate_date, pair)
+            )
+        """)
+        self._connection.commit()
+
+    def get(self, rate_date, pair: str = "EURUSD"):
+        """Returns the cached rate for the date, or None on a miss or expired live rate."""
+        rate_date = as_date(rate_date)
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT rate, fetched_at FROM fx_rates WHERE rate_date = ? AND pair = ?",
+                (rate_date.isoformat(), pair)
+            ).fetchone()
+            if row is not None:
+                rate, fetched_at = row
+                # Stored while its day was still running, the rate may have moved since
+                final = date.fromtimestamp(fetched_at) > rate_date
+                if final or time.time() - fetched_at < self.live_ttl:
+                    self.hits += 1
+                    FX_CACHE_HITS.inc()
+                    return rate
+            self.misses += 1
+            FX_CACHE_MISSES.inc()
+            return None
+
+    def get_many(self, rate_dates, pair: str = "EURUSD") -> dict:
+        """Returns a date->rate mapping of the dates that are cached and still valid."""
+        rates = {}
+        for rate_date in rate_dates:
+            rate = self.get(rate_date, pair)
+            if rate is not None:
+                rates[as_date(rate_date)] = rate
+        return rates
+
+    def put(self, rate_date, rate: float, pair: str = "EURUSD"):
+        """Stores a rate, replacing any previous value for the same date and pair."""
+        self.put_many({as_date(rate_date): rate}, pair)
+
+    def put_many(self, rates: dict, pair: str = "EURUSD"):
+        """Stores a date->rate mapping in a single transaction."""
+        now = time.time()
+        rows = [(as_date(d).isoformat(), pair, float(r), now) for d, r in rates.items()]
+        if not rows:
+            return
+        with self._lock:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO fx_rates (rate_date, pair, rate, fetched_at) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._connection.commit()
+
+    def stats(self) -> dict:
+        """Returns hit/miss counters for the lifetime of this cache instance."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+    def close(self):
+        """Close the underlying database file."""
+        with self._lock:
+            self._connection.close()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_cache() -> FXRateCache:
+    """Returns the process-wide rate cache, opening it on first use."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = FXRateCache()
+            logger.info(f"FX rate cache opened at {_default_cache.path}")
+    return _default_cache
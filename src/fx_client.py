@@ -0,0 +1,441 @@
+import asyncio
+import os
+import threading
+import time
+import weakref
+from bisect import bisect_right
+from datetime import datetime, date, timedelta
+import logging
+
+import httpx
+from dotenv import load_dotenv
+
+from fx_cache import get_cache, as_date
+from metrics import REGISTRY
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+FRANKFURTER_URL = os.getenv("FRANKFURTER_URL", "https://api.frankfurter.app")
+CURRENCYLAYER_URL = os.getenv("CURRENCYLAYER_URL", "https://api.currencylayer.com")
+# Seconds to wait on the preferred provider before also asking the next one
+HEDGE_DELAY = float(os.getenv("FX_HEDGE_DELAY", "1.0"))
+
+FX_REQUEST_SECONDS = REGISTRY.histogram("fx_request_duration_seconds", "Duration of FX provider requests", ("provider",))
+FX_REQUEST_ERRORS = REGISTRY.counter("fx_request_errors_total", "Failed FX provider requests", ("provider",))
+FX_FALLBACKS = REGISTRY.counter(
+    "fx_fallbacks_total",
+    "Rate lookups that went beyond the preferred path: hedge (second provider asked while the first was slow), "
+    "failover (first provider failed), live_rate (today's live rate), single_day (per-day lookup after a time series gap)",
+    ("kind",)
+)
+
+
+class ProviderUnavailableError(Exception):
+    """Raised when a provider is skipped because its circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Stops calling a provider after `failure_threshold` consecutive failures.
+
+    Once open, the breaker lets a single trial request through after
+    `reset_timeout` seconds; a success closes it again, a failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Returns whether a request may be sent now."""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                # Let one trial request through and hold the rest back for another period
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class ProviderHealth:
+    """Process-wide circuit breaker, latency histogram and moving average latency of a provider."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.breaker = CircuitBreaker()
+        self.latency = FX_REQUEST_SECONDS.labels(provider=name)
+        self.errors = FX_REQUEST_ERRORS.labels(provider=name)
+        self.average_latency = None
+
+    def record_latency(self, seconds: float):
+        self.latency.observe(seconds)
+        # Exponentially weighted, so a provider that slows down loses preference quickly
+        if self.average_latency is None:
+            self.average_latency = seconds
+        else:
+            self.average_latency = 0.8 * self.average_latency + 0.2 * seconds
+
+    def record(self, seconds: float, success: bool):
+        self.record_latency(seconds)
+        if success:
+            self.breaker.record_success()
+        else:
+            self.errors.inc()
+            self.breaker.record_failure()
+
+
+PROVIDERS = {
+    "frankfurter": ProviderHealth("frankfurter"),
+    "currencylayer": ProviderHealth("currencylayer"),
+}
+
+
+def provider_stats() -> dict:
+    """Returns breaker state and latency histogram of every provider."""
+    return {
+        name: {
+            "state": health.breaker.state,
+            "consecutive_failures": health.breaker.failures,
+            "average_latency": health.average_latency,
+            "p50": health.latency.quantile(0.5),
+            "p99": health.latency.quantile(0.99),
+            "latency": health.latency.snapshot(),
+        }
+        for name, health in PROVIDERS.items()
+    }
+
+
+class AsyncFXClient:
+    """
+    Async client for the Frankfurter and Currencylayer providers.
+
+    All requests share one keep-alive connection pool, and each provider has its
+    own semaphore so a bulk job cannot flood a single provider. An instance is
+    bound to the event loop it is first used on; use `get_client()` to get the
+    one belonging to the running loop.
+    """
+
+    def __init__(self, max_connections: int = 10, frankfurter_concurrency: int = 4,
+                 currencylayer_concurrency: int = 2, timeout: float = 5):
+        self.timeout = timeout
+        self._http = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=timeout
+        )
+        self._semaphores = {
+            "frankfurter": asyncio.Semaphore(frankfurter_concurrency),
+            "currencylayer": asyncio.Semaphore(currencylayer_concurrency),
+        }
+
+    async def _get_json(self, provider: str, url: str, timeout: float = None) -> dict:
+        """
+        Performs a GET request against a provider within its concurrency limit,
+        recording its latency and outcome in the provider's health.
+        """
+        health = PROVIDERS[provider]
+        if not health.breaker.allow():
+            raise ProviderUnavailableError(f"{provider} circuit breaker is open")
+        async with self._semaphores[provider]:
+            started = time.perf_counter()
+            try:
+                response = await self._http.get(url, timeout=timeout or self.timeout)
+                response.raise_for_status()
+                data = response.json()
+            except asyncio.CancelledError:
+                # A hedged request that lost the race was at least this slow, but did not fail
+                health.record_latency(time.perf_counter() - started)
+                raise
+            except Exception:
+                health.record(time.perf_counter() - started, success=False)
+                raise
+            health.record(time.perf_counter() - started, success=True)
+            return data
+
+    async def get_frankfurter_rate(self, date: date) -> float:
+        """Fetches the EUR to USD rate for a date using Frankfurter API."""
+        date_string = date.strftime("%Y-%m-%d")
+        url = f"{FRANKFURTER_URL}/{date_string}?from=EUR&to=USD"
+
+        try:
+            data = await self._get_json("frankfurter", url)
+            rate = data.get("rates", {}).get("USD")
+            if rate:
+                logger.info(f"Frankfurter API: Fetched rate {rate} for {date_string}")
+                return rate
+            logger.warning(f"Frankfurter API: No USD rate found for {date_string}")
+            return None
+        except (httpx.HTTPError, ValueError, ProviderUnavailableError) as e:
+            logger.error(f"Frankfurter API error for {date_string}: {e}")
+            return None
+
+    async def get_frankfurter_rates(self, start: date, end: date) -> dict:
+        """
+        Fetches EUR to USD rates for every business day between start and end, inclusive,
+        with a single request to the Frankfurter time series endpoint.
+        Returns a date->rate mapping, empty if the request fails.
+        """
+        range_string = f"{start.strftime('%Y-%m-%d')}..{end.strftime('%Y-%m-%d')}"
+        url = f"{FRANKFURTER_URL}/{range_string}?from=EUR&to=USD"
+
+        try:
+            data = await self._get_json("frankfurter", url, timeout=10)
+            rates = {}
+            for date_string, day_rates in data.get("rates", {}).items():
+                rate = day_rates.get("USD")
+                if rate:
+                    rates[datetime.strptime(date_string, "%Y-%m-%d").date()] = rate
+            logger.info(f"Frankfurter API: Fetched {len(rates)} rates for {range_string}")
+            return rates
+        except (httpx.HTTPError, ValueError, ProviderUnavailableError) as e:
+            logger.error(f"Frankfurter API error for {range_string}: {e}")
+            return {}
+
+    async def get_currencylayer_historical_rate(self, date: date) -> float:
+        """Fetches historical conversion rate from EUR to USD using Currencylayer API."""
+        api_key = os.getenv("CURRENCYLAYER_API_KEY")
+        if not api_key:
+            logger.error("Currencylayer API key not found")
+            return None
+
+        date_string = date.strftime("%Y-%m-%d")
+        url = f"{CURRENCYLAYER_URL}/historical?access_key={api_key}&date={date_string}&source=EUR&currencies=USD"
+
+        try:
+            data = await self._get_json("currencylayer", url)
+            if data.get("success"):
+                rate = data["quotes"]["EURUSD"]
+                logger.info(f"Currencylayer historical: Fetched rate {rate} for {date_string}")
+                return rate
+            logger.warning(f"Currencylayer historical API error: {data.get('error', {}).get('info', 'Unknown error')}")
+            return None
+        except (httpx.HTTPError, ValueError, ProviderUnavailableError) as e:
+            logger.error(f"Currencylayer historical error for {date_string}: {e}")
+            return None
+
+    async def get_currencylayer_live_rate(self) -> float:
+        """Fetches live conversion rate from EUR to USD using Currencylayer API."""
+        api_key = os.getenv("CURRENCYLAYER_API_KEY")
+        if not api_key:
+            logger.error("Currencylayer API key not found")
+            return None
+
+        url = f"{CURRENCYLAYER_URL}/live?access_key={api_key}&source=EUR&currencies=USD"
+
+        try:
+            data = await self._get_json("currencylayer", url)
+            if data.get("success"):
+                rate = data["quotes"]["EURUSD"]
+                logger.info(f"Currencylayer live: Fetched rate {rate}")
+                return rate
+            logger.warning(f"Currencylayer live API error: {data.get('error', {}).get('info', 'Unknown error')}")
+            return None
+        except (httpx.HTTPError, ValueError, ProviderUnavailableError) as e:
+            logger.error(f"Currencylayer live error: {e}")
+            return None
+
+    async def get_eur_to_usd_rate(self, date: date) -> float:
+        """
+        Returns the EUR to USD rate for a date, checking the local rate cache
+        before falling back through the providers. Returns None if all attempts fail.
+        """
+        day = as_date(date)
+        cache = await asyncio.to_thread(get_cache)
+        # The cache is SQLite behind a lock shared with other threads, so it is opened, read and written off the loop
+        rate = await asyncio.to_thread(cache.get, day)
+        if rate is not None:
+            return rate
+
+        rate = await self._hedged_historical_rate(day)
+
+        # If the date is today, try Currencylayer live rate as a last resort
+        if rate is None and day == datetime.today().date():
+            logger.warning("Falling back to Currencylayer live rate")
+            FX_FALLBACKS.labels(kind="live_rate").inc()
+            rate = await self.get_currencylayer_live_rate()
+
+        if rate is None:
+            logger.error(f"Failed to fetch conversion rate for {day.strftime('%Y-%m-%d')}")
+            return None
+
+        await asyncio.to_thread(cache.put, day, rate)
+        return rate
+
+    def _historical_providers(self) -> list:
+        """
+        Returns the historical rate providers in the order they should be asked:
+        providers with a closed breaker first, then by moving average latency.
+        A provider that has not been measured yet keeps its configured position
+        behind the measured ones, so Frankfurter stays first until proven slow.
+        """
+        providers = [("frankfurter", self.get_frankfurter_rate)]
+        if os.getenv("CURRENCYLAYER_API_KEY"):
+            providers.append(("currencylayer", self.get_currencylayer_historical_rate))
+        return sorted(
+            providers,
+            key=lambda provider: (PROVIDERS[provider[0]].breaker.state == "open",
+                                  PROVIDERS[provider[0]].average_latency is None,
+                                  PROVIDERS[provider[0]].average_latency or 0.0)
+        )
+
+    async def _hedged_historical_rate(self, day: date) -> float:
+        """
+        Asks the preferred provider for the rate and, if it has not answered after
+        HEDGE_DELAY seconds or has failed, the next one as well. The first rate
+        returned wins and the remaining requests are cancelled.
+        """
+        providers = self._historical_providers()
+        pending = {}
+        asked = 0
+        try:
+            while providers or pending:
+                if providers:
+                    name, fetch = providers.pop(0)
+                    if pending:
+                        logger.warning(f"Hedging {day.strftime('%Y-%m-%d')} rate request to {name}")
+                        FX_FALLBACKS.labels(kind="hedge").inc()
+                    elif asked:
+                        FX_FALLBACKS.labels(kind="failover").inc()
+                    asked += 1
+                    pending[asyncio.ensure_future(fetch(day))] = name
+                done, _ = await asyncio.wait(
+                    pending, timeout=HEDGE_DELAY if providers else None, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    name = pending.pop(task)
+                    rate = task.result()
+                    if rate is not None:
+                        return rate
+                    logger.warning(f"{name} returned no rate for {day.strftime('%Y-%m-%d')}")
+            return None
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def convert_eur_to_usd(self, amount_eur: float, date: date) -> float:
+        """
+        Converts EUR to USD using multiple APIs with fallback strategy.
+        Returns the converted amount or None if all attempts fail.
+        """
+        rate = await self.get_eur_to_usd_rate(date)
+        if rate is not None:
+            return amount_eur * rate
+        return None
+
+    async def convert_eur_to_usd_many(self, amounts, dates) -> list:
+        """
+        Converts many EUR amounts to USD, one date per amount.
+        Dates missing from the local rate cache are fetched with a single time series
+        request; weekends and holidays take the rate of the last business day before them.
+        Returns a list of converted amounts, with None where no rate could be found.
+        """
+        days = [as_date(d) for d in dates]
+        cache = await asyncio.to_thread(get_cache)
+        rates = await asyncio.to_thread(cache.get_many, set(days))
+
+        missing = sorted(set(days) - rates.keys())
+        if missing:
+            # Start a week early so a range opening on a weekend or holiday still has a prior rate
+            fetched = await self.get_frankfurter_rates(missing[0] - timedelta(days=7), missing[-1])
+            await asyncio.to_thread(cache.put_many, fetched)
+            fetched_days = sorted(fetched)
+            resolved = {}
+            for day in missing:
+                index = bisect_right(fetched_days, day)
+                if index:
+                    resolved[day] = fetched[fetched_days[index - 1]]
+            await asyncio.to_thread(cache.put_many, resolved)
+            rates.update(resolved)
+
+            unresolved = [day for day in missing if day not in rates]
+            if unresolved:
+                FX_FALLBACKS.labels(kind="single_day").inc(len(unresolved))
+            fallback_rates = await asyncio.gather(*(self.get_eur_to_usd_rate(day) for day in unresolved))
+            rates.update(zip(unresolved, fallback_rates))
+
+        return [
+            amount * rates[day] if rates[day] is not None else None
+            for amount, day in zip(amounts, days)
+        ]
+
+    async def aclose(self):
+        """Close the connection pool."""
+        await self._http.aclose()
+
+
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_client() -> AsyncFXClient:
+    """Returns the shared client for the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = AsyncFXClient()
+        _clients[loop] = client
+    return client
+
+
+async def close_client():
+    """Close the shared client of the running event loop, if any."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+async def convert_eur_to_usd(amount_eur: float, date: date) -> float:
+    """Converts EUR to USD with the shared client of the running event loop."""
+    return await get_client().convert_eur_to_usd(amount_eur, date)
+
+
+async def convert_eur_to_usd_many(amounts, dates) -> list:
+    """Converts many EUR amounts to USD with the shared client of the running event loop."""
+    return await get_client().convert_eur_to_usd_many(amounts, dates)
+
+
+_sync_loop = None
+_sync_loop_lock = threading.Lock()
+
+
+def run_sync(coroutine_function, *args):
+    """
+    Runs `coroutine_function(client, *args)` on a background event loop and waits for
+    the result. The loop lives for the whole process, so synchronous callers share a
+    warm connection pool between calls, and it is safe to call from a thread that is
+    itself running an event loop.
+    """
+    global _sync_loop
+    with _sync_loop_lock:
+        if _sync_loop is None:
+            _sync_loop = asyncio.new_event_loop()
+            threading.Thread(target=_sync_loop.run_forever, name="fx-client-loop", daemon=True).start()
+
+    async def call():
+        return await coroutine_function(get_client(), *args)
+
+    return asyncio.run_coroutine_threadsafe(call(), _sync_loop).result()
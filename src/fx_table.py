@@ -0,0 +1,211 @@
+import csv
+import logging
+import os
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOURCE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                   "..", "EuropeanCentralBank_Euro_FX - eurofxref-hist.csv")
+DEFAULT_TABLE_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ecb_rates.npz")
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+class FXTable:
+    """
+    Euro reference rates of every ECB currency, as arrays indexed by date ordinal.
+
+    Rows are the ECB publication days in ascending order. Missing values are
+    forward-filled from the previous publication, so a lookup never hits a gap
+    once a currency has started being quoted. Lookups take the rate published on
+    or before the requested day, which covers weekends and holidays.
+    """
+
+    def __init__(self, ordinals: np.ndarray, currencies, rates: np.ndarray):
+        self.ordinals = ordinals
+        self.currencies = tuple(currencies)
+        self.rates = rates
+        self._columns = {currency: i for i, currency in enumerate(self.currencies)}
+
+    def __len__(self):
+        return len(self.ordinals)
+
+    @property
+    def first_date(self) -> date:
+        return date.fromordinal(int(self.ordinals[0])) if len(self) else None
+
+    @property
+    def last_date(self) -> date:
+        return date.fromordinal(int(self.ordinals[-1])) if len(self) else None
+
+    def _column(self, currency: str) -> np.ndarray:
+        try:
+            return self.rates[:, self._columns[currency.upper()]]
+        except KeyError:
+            raise KeyError(f"No ECB rates for currency {currency}") from None
+
+    def has_currency(self, currency: str) -> bool:
+        return currency.upper() == "EUR" or currency.upper() in self._columns
+
+    def rate(self, currency: str, day: date):
+        """EUR to `currency` rate on or before `day`, or None before the first quote."""
+        column = self._column(currency)
+        index = np.searchsorted(self.ordinals, day.toordinal(), side="right") - 1
+        if index < 0 or np.isnan(column[index]):
+            return None
+        return float(column[index])
+
+    def rates_for(self, currency: str, days) -> np.ndarray:
+        """
+        Vectorized `rate`: EUR to `currency` rates on or before each of `days`.
+
+        Args:
+            days: Sequence of dates, or a datetime64 array
+
+        Returns:
+            np.ndarray: float64 rates, NaN before the first quote
+        """
+        return self._lookup(self._column(currency), to_ordinals(days))
+
+    def _lookup(self, column: np.ndarray, ordinals: np.ndarray) -> np.ndarray:
+        indices = np.searchsorted(self.ordinals, ordinals, side="right") - 1
+        result = column[np.maximum(indices, 0)]
+        result[indices < 0] = np.nan
+        return result
+
+    def _rates_at(self, currency: str, indices: np.ndarray) -> np.ndarray:
+        """EUR to `currency` rates at row indices; EUR itself is always 1."""
+        if currency.upper() == "EUR":
+            return np.ones(len(indices))
+        return self._column(currency)[indices]
+
+    def cross_rates(self, source: str, targets, days) -> np.ndarray:
+        """
+        Rates from `source` into each of `targets` on or before each of `days`,
+        crossed through EUR: rate(source -> target) = rate(EUR -> target) / rate(EUR -> source).
+
+        Returns:
+            np.ndarray: float64 array of shape (len(days), len(targets)), NaN where a
+                currency was not quoted yet
+        """
+        ordinals = to_ordinals(days)
+        indices = np.searchsorted(self.ordinals, ordinals, side="right") - 1
+        before_first = indices < 0
+        indices = np.maximum(indices, 0)
+        source_rates = self._rates_at(source, indices)
+        result = np.column_stack([self._rates_at(target, indices) for target in targets]) / source_rates[:, None]
+        result[before_first] = np.nan
+        return result
+
+    def convert(self, amounts, days, source: str = "EUR", target: str = "USD") -> np.ndarray:
+        """Convert `amounts` dated `days` from `source` to `target` in one array operation."""
+        return np.asarray(amounts, dtype=np.float64) * self.cross_rates(source, [target], days)[:, 0]
+
+    def convert_many(self, amounts, days, targets, source: str = "EUR") -> dict:
+        """Convert `amounts` dated `days` from `source` into several currencies at once."""
+        converted = np.asarray(amounts, dtype=np.float64)[:, None] * self.cross_rates(source, targets, days)
+        return {target: converted[:, i] for i, target in enumerate(targets)}
+
+    def daily_rates(self, currency: str) -> list:
+        """(date, rate) for every calendar day from the first quote to the last publication day."""
+        column = self._column(currency)
+        quoted = np.flatnonzero(~np.isnan(column))
+        if not len(quoted):
+            return []
+        days = np.arange(self.ordinals[quoted[0]], self.ordinals[-1] + 1)
+        rates = self._lookup(column, days)
+        first = date.fromordinal(int(days[0]))
+        return [(first + timedelta(days=i), rate) for i, rate in enumerate(rates.tolist())]
+
+
+def to_ordinals(days) -> np.ndarray:
+    """Date ordinals of a sequence of dates or a datetime64 array."""
+    if isinstance(days, np.ndarray) and days.dtype.kind == "M":
+        return days.astype("datetime64[D]").astype(np.int64) + EPOCH_ORDINAL
+    return np.fromiter((day.toordinal() for day in days), dtype=np.int64)
+
+
+def parse_ecb_csv(path: str) -> FXTable:
+    """Parse the ECB eurofxref-hist.csv file (newest day first, 'N/A' for missing) into an FXTable."""
+    with open(path, newline="", encoding="utf-8") as file:
+        reader = csv.reader(file)
+        header = next(reader)
+        # The file ends every line with a comma, which yields an unnamed column
+        columns = [i for i, name in enumerate(header) if i > 0 and name.strip()]
+        currencies = [header[i].strip() for i in columns]
+        ordinals = []
+        values = []
+        for row in reader:
+            if not row or not row[0]:
+                continue
+            ordinals.append(date.fromisoformat(row[0]).toordinal())
+            values.append([row[i] if i < len(row) else "" for i in columns])
+
+    rates = np.array(values, dtype="U16").reshape(-1, len(currencies))
+    rates = np.where(np.isin(rates, ("", "N/A")), "nan", rates).astype(np.float64)
+    ordinals = np.array(ordinals, dtype=np.int64)
+    order = np.argsort(ordinals, kind="stable")
+    ordinals, rates = ordinals[order], rates[order]
+
+    # Forward-fill each currency from its previous publication
+    positions = np.where(np.isnan(rates), 0, np.arange(len(rates))[:, None])
+    np.maximum.accumulate(positions, axis=0, out=positions)
+    rates = np.take_along_axis(rates, positions, axis=0)
+    return FXTable(ordinals, currencies, rates)
+
+
+def load_fx_table(source_path: str = None, cache_path: str = None) -> FXTable:
+    """
+    Load the ECB rate table, from the binary cache when it was built from the
+    current version of the source file, otherwise by parsing the CSV and
+    rewriting the cache.
+    """
+    source_path = source_path or os.getenv("ECB_CSV_PATH", DEFAULT_SOURCE_PATH)
+    cache_path = cache_path or os.getenv("ECB_TABLE_CACHE_PATH", DEFAULT_TABLE_CACHE_PATH)
+    stat = os.stat(source_path)
+    source_key = np.array([stat.st_mtime_ns, stat.st_size], dtype=np.int64)
+
+    try:
+        with np.load(cache_path) as cached:
+            if np.array_equal(cached["source_key"], source_key):
+                return FXTable(cached["ordinals"], cached["currencies"].tolist(), cached["rates"])
+    except (FileNotFoundError, KeyError, ValueError, OSError):
+        pass
+
+    table = parse_ecb_csv(source_path)
+    try:
+        temporary = f"{cache_path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as file:
+            np.savez(file, source_key=source_key, ordinals=table.ordinals,
+                     currencies=np.array(table.currencies), rates=table.rates)
+        os.replace(temporary, cache_path)
+    except OSError as e:
+        logger.warning(f"Could not write ECB rate cache {cache_path}: {e}")
+    return table
+
+
+_default_table = None
+_default_table_key = None
+_default_table_lock = threading.Lock()
+
+
+def get_fx_table() -> FXTable:
+    """Returns the process-wide ECB rate table, reloading it when the source file changes."""
+    global _default_table, _default_table_key
+    source_path = os.getenv("ECB_CSV_PATH", DEFAULT_SOURCE_PATH)
+    stat = os.stat(source_path)
+    key = (source_path, stat.st_mtime_ns, stat.st_size)
+    with _default_table_lock:
+        if _default_table is None or _default_table_key != key:
+            _default_table = load_fx_table(source_path)
+            _default_table_key = key
+            logger.info(f"ECB rate table loaded: {len(_default_table)} days, {len(_default_table.currencies)} currencies")
+    return _default_table
+
+
+def convert_amounts(amounts, days, source: str = "EUR", target: str = "USD") -> np.ndarray:
+    """Convert amounts between any two ECB currencies with the process-wide rate table."""
+    return get_fx_table().convert(amounts, days, source, target)
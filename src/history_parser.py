@@ -0,0 +1,119 @@
+import logging
+from datetime import date
+
+from lxml import etree
+
+from models import PriceRow
+
+logger = logging.getLogger(__name__)
+
+# Header prefixes of the Börse Düsseldorf history table, per PriceRow field
+HEADER_PREFIXES = {
+    "date": ("Datum", "Date"),
+    "open": ("Eröffnung", "Erster", "Open"),
+    "high": ("Hoch", "High"),
+    "low": ("Tief", "Low"),
+    "close": ("Schluss", "Letzter", "Close"),
+    "volume": ("Stück", "Volumen", "Volume"),
+}
+
+_TABLE_XPATH = etree.XPath('//*[@id="instrument-historie"]//table')
+
+
+def parse_german_number(text: str):
+    """Converts '1.000,00'-style text to float, or None for empty cells and dashes."""
+    text = text.strip()
+    if not text or text == "-":
+        return None
+    return float(text.replace(".", "").replace(",", "."))
+
+
+def parse_german_date(text: str) -> date:
+    """Converts 'DD.MM.YYYY' to a date."""
+    day, month, year = text.strip().split(".")
+    return date(int(year), int(month), int(day))
+
+
+def _column_indices(headers: list) -> dict:
+    """Map each PriceRow field to the index of its column, or None if the table lacks it."""
+    indices = {}
+    for field, prefixes in HEADER_PREFIXES.items():
+        indices[field] = next(
+            (i for i, header in enumerate(headers) if header.startswith(prefixes)),
+            None
+        )
+    return indices
+
+
+def parse_history_table(page, watermark: date = None) -> list:
+    """
+    Parse the #instrument-historie table of a page into typed rows.
+
+    Args:
+        page (bytes or str): Page HTML
+        watermark (date): If given, stop at the first row dated on or before it.
+            The table is ordered newest first, so everything after that row is
+            already known.
+
+    Returns:
+        list: PriceRow entries in table order (newest first), or None if the page
+            has no history table or the table has no rows at all
+    """
+    if not page:
+        return None
+    parser = etree.HTMLParser()
+    document = etree.fromstring(page.encode("utf-8") if isinstance(page, str) else page, parser)
+    if document is None:
+        return None
+    tables = _TABLE_XPATH(document)
+    if not tables:
+        logger.warning("Historical table not found")
+        return None
+    table = tables[0]
+
+    headers = [th.xpath("string()").strip() for th in table.iterfind(".//thead//th")]
+    columns = _column_indices(headers)
+    if columns["date"] is None or columns["close"] is None:
+        logger.warning(f"Date or closing price column not found in headers: {headers}")
+        return None
+
+    def cell(cells, field, convert):
+        index = columns[field]
+        if index is None:
+            return None
+        return convert(cells[index])
+
+    rows = []
+    seen = 0
+    for tr in table.iterfind(".//tbody/tr"):
+        seen += 1
+        cells = ["".join(td.itertext()) for td in tr.iterfind("td")]
+        if len(cells) != len(headers):
+            logger.warning(f"Skipping row with mismatched columns: {cells}")
+            continue
+        try:
+            close = parse_german_number(cells[columns["close"]])
+            if close is None:
+                logger.warning(f"Skipping row without closing price: {cells}")
+                continue
+            volume = cell(cells, "volume", parse_german_number)
+            row_date = parse_german_date(cells[columns["date"]])
+            if watermark is not None and row_date <= watermark:
+                logger.info(f"Reached watermark {watermark}, stopping after {len(rows)} new rows")
+                break
+            rows.append(PriceRow(
+                date=row_date,
+                open=cell(cells, "open", parse_german_number),
+                high=cell(cells, "high", parse_german_number),
+                low=cell(cells, "low", parse_german_number),
+                close=close,
+                volume=int(volume) if volume is not None else None,
+            ))
+        except ValueError as e:
+            logger.warning(f"Skipping unparsable row {cells}: {e}")
+
+    if not seen:
+        logger.warning("Historical table has no rows")
+        return None
+    logger.info(f"Extracted {len(rows)} rows of historical data")
+    return rows
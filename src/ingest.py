@@ -0,0 +1,116 @@
+import asyncio
+import contextlib
+import copy
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class IngestRunner:
+    """
+    Runs the blocking ingest job on a single worker thread owned by the app.
+
+    Only one run can be in flight: a trigger that arrives while the previous run is
+    still going is skipped, including a run that exceeded `timeout` (its thread
+    cannot be killed, so it keeps the slot until it finishes). Every run records
+    the state, timing and details of each stage for the status endpoint.
+    """
+
+    def __init__(self, job, timeout: float = 30 * 60):
+        self.job = job
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest")
+        self._future = None
+        self._lock = threading.Lock()
+        self._status = {"state": "idle", "skipped_runs": 0, "last_run": None}
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        """Record the start, end and outcome of one stage of the current run."""
+        details = {}
+        record = {"state": "running", "started_at": _now(), "finished_at": None, "details": details}
+        with self._lock:
+            self._status["last_run"]["stages"][name] = record
+        started = time.perf_counter()
+        state, error = "failed", None
+        try:
+            yield details
+            state = "done"
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            with self._lock:
+                record["state"] = state
+                if error is not None:
+                    record["error"] = error
+                record["finished_at"] = _now()
+                record["seconds"] = round(time.perf_counter() - started, 3)
+
+    def _run_job(self):
+        try:
+            result = self.job(stage=self.stage)
+            self._finish("done", result=result)
+            return result
+        except Exception as e:
+            logger.exception("Ingest run failed")
+            self._finish("failed", error=str(e))
+            raise
+
+    def _finish(self, state: str, **details):
+        with self._lock:
+            run = self._status["last_run"]
+            # A run that timed out keeps that state, but still records when it finally ended
+            if run["state"] == "running":
+                run["state"] = state
+            run["finished_at"] = _now()
+            run.update(details)
+            self._status["state"] = "idle"
+
+    async def run(self) -> bool:
+        """
+        Start a run in the worker thread and wait for it, up to `timeout` seconds.
+        Returns True if the run completed successfully, False if it was skipped,
+        failed or timed out.
+        """
+        with self._lock:
+            if self._future is not None and not self._future.done():
+                self._status["skipped_runs"] += 1
+                logger.warning("Ingest run skipped: previous run is still in progress")
+                return False
+            self._status["state"] = "running"
+            self._status["last_run"] = {"state": "running", "started_at": _now(), "finished_at": None, "stages": {}}
+            self._future = asyncio.get_running_loop().run_in_executor(self._executor, self._run_job)
+
+        try:
+            # shield() keeps the run going when the wait times out
+            await asyncio.wait_for(asyncio.shield(self._future), self.timeout)
+            return True
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._status["last_run"]["state"] = "timed_out"
+            logger.error(f"Ingest run exceeded {self.timeout} s and is still running")
+            return False
+        except Exception:
+            return False
+
+    def status(self) -> dict:
+        """Returns the runner state and the record of the last run."""
+        with self._lock:
+            return {
+                "state": self._status["state"],
+                "skipped_runs": self._status["skipped_runs"],
+                "last_run": copy.deepcopy(self._status["last_run"]),
+            }
+
+    def shutdown(self):
+        """Stop accepting runs; a run in progress is left to finish in the background."""
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,37 @@
+import json
+import os
+from typing import NamedTuple
+
+BOERSE_URL = os.getenv("BOERSE_URL", "https://www.boerse-duesseldorf.de")
+
+
+class Instrument(NamedTuple):
+    """A certificate tracked on Börse Düsseldorf, identified by its ISIN."""
+    isin: str
+    slug: str
+    name: str
+
+    @property
+    def url(self) -> str:
+        """The instrument page holding the price history table."""
+        return f"{BOERSE_URL}/etc/{self.isin}/{self.slug}/"
+
+
+DEFAULT_INSTRUMENT = Instrument(
+    isin="DE000A4AJWY5",
+    slug="encore-issuances-s-a-comp-102-oend-z-25-unl-swissone-idx",
+    name="SwissOne"
+)
+DEFAULT_ISIN = DEFAULT_INSTRUMENT.isin
+
+
+def load_instruments() -> list:
+    """
+    Returns the tracked instruments. INSTRUMENTS_FILE may point to a JSON list of
+    {"isin", "slug", "name"} objects; without it only the SwissOne certificate is tracked.
+    """
+    path = os.getenv("INSTRUMENTS_FILE")
+    if not path:
+        return [DEFAULT_INSTRUMENT]
+    with open(path, encoding="utf-8") as file:
+        return [Instrument(**entry) for entry in json.load(file)]
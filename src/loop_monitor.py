@@ -0,0 +1,51 @@
+import asyncio
+import time
+
+from metrics import Histogram
+
+LOOP_LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+
+class LoopLagMonitor:
+    """
+    Measures event-loop lag: how late a sleep of `interval` seconds wakes up.
+    Anything that blocks the loop shows up directly as lag.
+    """
+
+    def __init__(self, interval: float = 0.1):
+        self.interval = interval
+        self.lag = Histogram(LOOP_LAG_BUCKETS)
+        self.last = 0.0
+        self.max = 0.0
+        self._task = None
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - started - self.interval)
+            self.last = lag
+            self.max = max(self.max, lag)
+            self.lag.observe(lag)
+
+    def start(self):
+        """Start sampling on the running event loop."""
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "last": self.last,
+            "max": self.max,
+            "p50": self.lag.quantile(0.5),
+            "p99": self.lag.quantile(0.99),
+            "samples": self.lag.count,
+        }
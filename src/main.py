@@ -1,287 +1,174 @@
-from fastapi import FastAPI
-from fastapi.responses import HTMLResponse
-from database_client import DatabaseClient
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import HTMLResponse, Response
+from database_client import ConnectionPool
+from async_database_client import AsyncDatabaseClient, DatabaseError
+from loop_monitor import LoopLagMonitor
+from ingest import IngestRunner
+from instruments import DEFAULT_ISIN, load_instruments
+from dashboard import (DASHBOARD_HTML, CURRENCIES, CROSS_CURRENCIES, CachedResponse, DashboardCache,
+                       add_currency_views, etag_matches, price_series, price_series_from_arrays)
+from fx_table import get_fx_table
+from metrics import REGISTRY
+from snapshot import load_fresh_snapshot
+import asyncio
 import json
+import logging
 import os
+import time
 from dotenv import load_dotenv
-from utility import get_dates_from, populate_new_data_database
+from utility import populate_new_data_database
 from datetime import date
-from datetime import timedelta
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from pytz import utc
 from contextlib import asynccontextmanager
 
+logger = logging.getLogger(__name__)
 scheduler = AsyncIOScheduler(timezone=utc)
+loop_monitor = LoopLagMonitor()
+ingest_runner = IngestRunner(populate_new_data_database, timeout=float(os.getenv("INGEST_TIMEOUT", "1800")))
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    scheduler.start()
-    yield
-    scheduler.shutdown()
-
-app = FastAPI(lifespan=lifespan)
-
-@app.get("/", response_class=HTMLResponse)
-async def root():
     load_dotenv()
-    one_month_ago = date.today() - timedelta(days=30)
-    dates = get_dates_from(one_month_ago)
-
-    DB = DatabaseClient(
+    app.state.db_pool = ConnectionPool(
         host=os.getenv("DB_HOST"),
         port=int(os.getenv("DB_PORT")),
         dbname=os.getenv("DB_NAME"),
         user=os.getenv("DB_USER"),
         password=os.getenv("DB_PASSWORD"),
-        sslmode=os.getenv("DB_SSLMODE", "allow")
+        sslmode=os.getenv("DB_SSLMODE", "allow"),
+        minconn=int(os.getenv("DB_POOL_MIN", "1")),
+        maxconn=int(os.getenv("DB_POOL_MAX", "10"))
     )
-    DB.connect()
-
-    # Get historical data
-    data = DB.read_price_range(date(2025, 1, 1), date.today())
-    dates = [str(v[0]) for v in data]
-    price_usd = [float(v[1]) for v in data]
-    price_eur = [float(v[2]) for v in data]
-
-    DB.disconnect()
-
-    # Prepare data for JSON
-    chart_data = {
-        "labels": dates,
-        "usd_values": price_usd,
-        "eur_values": price_eur,
-        "most_recent_date": str(dates[-1]),
-        "most_recent_price_usd": price_usd[-1],
-        "most_recent_price_eur": price_eur[-1]
-    }
-
-    html = """
-    <!DOCTYPE html>
-<html lang="en">
-  <head>
-    <meta charset="UTF-8" />
-    <meta name="viewport" content="width=device-width, initial-scale=1.0" />
-    <title>Price Chart</title>
-    <script src="https://cdn.tailwindcss.com"></script>
-    <script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
-    <style>
-      body {
-        font-family: 'Roboto', sans-serif;
-        background: linear-gradient(135deg, #0f0f0f, #1e1e1e);
-        color: white;
-      }
-      canvas {
-        max-width: 100%;
-        height: 100%;
-      }
-    </style>
-  </head>
-  <body>
-    <div class="container mx-auto px-4 py-8 max-w-5xl">
-      <!-- Heading Section -->
-      <div class="mb-2 text-center sm:text-left">
-        <h1 class="text-3xl sm:text-4xl font-bold text-red-500 tracking-tight mb-2">
-          Price Chart
-        </h1>
-        <p class="text-gray-300 text-sm sm:text-base">
-          Chart showing recent closing prices
-        </p>
-      </div>
-
-      <div class='mb-4 text-center sm:text-left'>
-        <div class="flex items-baseline space-x-4">
-            <h2 id="mostRecentPrice" class="text-3xl font-semibold">$0.00</h2>
-            <h3 id="performanceChange">0%</h3>
-        </div>
-        <h2 id="mostRecentDate" class="text-sm text-gray-400">2023-01-01</h2>
-      </div>
-
-      <div class="flex flex-col sm:flex-row sm:items-center sm:justify-between mb-4">
-        <div class="mb-4 text-center sm:text-left">
-            <input type="date" id="startDate" min="2025-01-01" class="p-2 rounded-lg bg-gray-800 text-white border border-gray-700 mr-2" />
-            <input type="date" id="endDate" class="p-2 rounded-lg bg-gray-800 text-white border border-gray-700 mr-2" />
-            <button id="filterButton" class="bg-red-500 hover:bg-red-600 text-white py-1 px-4 rounded-lg transition duration-200">
-            Apply
-            </button>
-        </div>
-
-        <!-- Button Section -->
-        <div class="mb-4 text-center sm:text-left">
-            <button
-            id="toggleCurrency"
-            class="bg-transparent border-2 border-red-500 hover:bg-red-500 text-white py-1 px-2 rounded-lg transition duration-200"
-            >
-            Switch to EUR
-            </button>
-        </div>
-       </div>
-
-      <!-- Chart Card -->
-      <div
-        class="bg-[#1a1a1a] p-6 rounded-2xl shadow-xl h-[500px] flex items-center justify-center"
-      >
-        <canvas id="priceChart"></canvas>
-      </div>
-    </div>
-
-      <script>
-        const chartData = REPLACE_CHART_DATA_HERE;
-        const ctx = document.getElementById('priceChart').getContext('2d');
-        let performance = 0;
-        let isUSD = true;
-
-        let currentLabels = [...chartData.labels];
-        let currentUSD = [...chartData.usd_values];
-        let currentEUR = [...chartData.eur_values];
-
-        function calculatePerformance() {
-          const initialPrice = isUSD ? currentUSD[0] : currentEUR[0];
-          const mostRecentPrice = isUSD ? currentUSD[currentUSD.length - 1] : currentEUR[currentEUR.length - 1];
-          performance = ((mostRecentPrice - initialPrice) / initialPrice) * 100;
-          
-          let symbol = performance >= 0 ? '+' : '';
-          const performanceElement = document.getElementById('performanceChange');
-          performanceElement.textContent = `${symbol}${performance.toFixed(2)}%`;
-          performanceElement.style.color = performance >= 0 ? '#4CAF50' : '#F44336';
-
-        }
-
-        function filterChartData(startDate, endDate) {
-          const start = new Date(startDate);
-          const end = new Date(endDate);
-
-          const filteredLabels = [];
-          const filteredUSD = [];
-          const filteredEUR = [];
-
-          chartData.labels.forEach((label, index) => {
-              const currentDate = new Date(label);
-              if (currentDate >= start && currentDate <= end) {
-                  filteredLabels.push(label);
-                  filteredUSD.push(chartData.usd_values[index]);
-                  filteredEUR.push(chartData.eur_values[index]);
-              }
-          });
-
-          currentLabels = filteredLabels;
-          currentUSD = filteredUSD;
-          currentEUR = filteredEUR;
-
-          // Update the chart with the filtered data
-          priceChart.data.labels = currentLabels;
-          priceChart.data.datasets[0].data = isUSD ? currentUSD : currentEUR;
-          priceChart.update();
-        }
-
-        const chartConfig = {
-          type: 'line',
-          data: {
-            labels: chartData.labels,
-            datasets: [
-              {
-                label: 'Closing Price (USD)',
-                data: chartData.usd_values,
-                borderColor: '#F44336',
-                backgroundColor: 'rgba(244, 67, 54, 0.2)',
-                fill: true,
-                tension: 0,
-                pointRadius: 1,
-                pointHoverRadius: 4,
-                pointBackgroundColor: '#3B82F6',
-                pointBorderColor: '#fff',
-                pointBorderWidth: 1
-              }
-            ]
-          },
-          options: {
-            responsive: true,
-            maintainAspectRatio: false,
-            plugins: {
-              tooltip: {
-                backgroundColor: '#111827',
-                titleColor: '#facc15',
-                bodyColor: '#f5f5f5',
-                borderColor: '#3B82F6',
-                borderWidth: 1,
-                padding: 10
-              }
-            },
-            scales: {
-              x: {
-                title: {
-                  display: true,
-                  text: 'Date',
-                  color: '#f5f5f5',
-                  font: {
-                    weight: 'bold'
-                  }
-                },
-                ticks: {
-                  color: '#d1d5db'
-                },
-                grid: {
-                  color: 'rgba(255,255,255,0.05)'
-                }
-              },
-              y: {
-                title: {
-                  display: true,
-                  text: 'Closing Price (USD)',
-                  color: '#f5f5f5',
-                  font: {
-                    weight: 'bold'
-                  }
-                },
-                ticks: {
-                  color: '#d1d5db'
-                },
-                grid: {
-                  color: 'rgba(255,255,255,0.1)'
-                }
-              }
-            }
-          }
-        };
+    app.state.db = AsyncDatabaseClient(app.state.db_pool)
+    try:
+        # Parsing the ECB file takes a noticeable fraction of a second; do it before the first request
+        await asyncio.to_thread(get_fx_table)
+    except OSError as e:
+        logger.warning(f"ECB rate table not loaded, CHF and GBP prices are unavailable: {e}")
+    loop_monitor.start()
+    scheduler.start()
+    yield
+    scheduler.shutdown()
+    await loop_monitor.stop()
+    ingest_runner.shutdown()
+    app.state.db.shutdown()
+    app.state.db_pool.closeall()
 
-        const priceChart = new Chart(ctx, chartConfig);
+app = FastAPI(lifespan=lifespan)
 
-        document.getElementById('mostRecentPrice').textContent = `$${isUSD ? chartData.most_recent_price_usd.toFixed(2) : chartData.most_recent_price_eur.toFixed(2)}`;
-        document.getElementById('mostRecentDate').textContent = `${chartData.most_recent_date}`;
-        calculatePerformance(); // <-- Calculate and display performance on load
+dashboard_cache = DashboardCache()
+dashboard_page = CachedResponse.build(DASHBOARD_HTML, "text/html")
+
+MAX_POINTS_LIMIT = 5000
+DASHBOARD_RENDER_SECONDS = REGISTRY.histogram(
+    "dashboard_render_seconds", "Time to build a /api/prices payload once its data is loaded, by data source", ("source",)
+)
+instruments = {instrument.isin: instrument for instrument in load_instruments()}
+
+def cached_response(request: Request, cached: CachedResponse) -> Response:
+    """Serve a cached body, answering 304 to a matching If-None-Match and gzip when accepted."""
+    headers = {"ETag": cached.etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if etag_matches(request.headers.get("if-none-match"), cached.etag):
+        return Response(status_code=304, headers=headers)
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=cached.gzipped, media_type=cached.media_type, headers=headers)
+    return Response(content=cached.body, media_type=cached.media_type, headers=headers)
 
-        document.getElementById('filterButton').addEventListener('click', () => {
-            const startDate = document.getElementById('startDate').value;
-            const endDate = document.getElementById('endDate').value;
-            if (startDate && endDate) {
-            // Call a function to filter the chart data based on the selected dates
-            filterChartData(startDate, endDate);
-              calculatePerformance();
-            }
-        });
-          document.getElementById('toggleCurrency').addEventListener('click', () => {
-              isUSD = !isUSD;
-              const dataset = priceChart.data.datasets[0];
+@app.get("/", response_class=HTMLResponse)
+async def root(request: Request):
+    # The page is static; its data comes from /api/prices
+    return cached_response(request, dashboard_page)
+
+@app.get("/api/instruments")
+async def api_instruments():
+    """The tracked instruments, default first."""
+    return sorted(
+        ({"isin": instrument.isin, "name": instrument.name} for instrument in instruments.values()),
+        key=lambda instrument: instrument["isin"] != DEFAULT_ISIN
+    )
 
-              dataset.data = isUSD ? currentUSD : currentEUR;  // ✅ uses filtered data if available
-              dataset.label = isUSD ? 'Closing Price (USD)' : 'Closing Price (EUR)';
-              dataset.borderColor = isUSD ? '#F44336' : '#3B82F6';
-              dataset.backgroundColor = isUSD ? 'rgba(244, 67, 54, 0.2)' : 'rgba(59, 130, 246, 0.2)';
-              priceChart.options.scales.y.title.text = isUSD ? 'Closing Price (USD)' : 'Closing Price (EUR)';
-              document.getElementById('toggleCurrency').textContent = isUSD ? 'Switch to EUR' : 'Switch to USD';
-              calculatePerformance(); // <-- Update performance on currency switch
-              priceChart.update();
-          });
-      </script>
-  </body>
-</html>
-    """
-    # Inject JS to calculate and display performance on load
-    injected_js = """
-    """
-    html = html.replace("<script>\n      const chartData = REPLACE_CHART_DATA_HERE;", injected_js)
-    html = html.replace("REPLACE_CHART_DATA_HERE", json.dumps(chart_data))
-    return HTMLResponse(content=html)
+def render_prices(snapshot, rows, start: date, end: date, currency: str, max_points: int) -> CachedResponse:
+    """Build the /api/prices response from a fresh snapshot or, without one, from database rows."""
+    if snapshot is not None:
+        source, started = "snapshot", time.perf_counter()
+        series = price_series_from_arrays(*snapshot.between(start, end), max_points)
+    else:
+        source, started = "database", time.perf_counter()
+        series = price_series(rows, max_points)
+    try:
+        add_currency_views(series, get_fx_table())
+    except OSError:
+        # Without the local ECB file only the stored USD and EUR prices can be served
+        if currency in CROSS_CURRENCIES:
+            raise HTTPException(status_code=503, detail="ECB rates are not available")
+    if currency != "all":
+        for other in CURRENCIES:
+            if other != currency:
+                series.pop(f"{other}_values", None)
+                series.pop(f"most_recent_price_{other}", None)
+    rendered = CachedResponse.build(json.dumps(series), "application/json")
+    DASHBOARD_RENDER_SECONDS.labels(source=source).observe(time.perf_counter() - started)
+    return rendered
+
+@app.get("/api/prices")
+async def api_prices(request: Request, start: date = date(2025, 1, 1), end: date = None,
+                     currency: str = "all", max_points: int = 1000, instrument: str = DEFAULT_ISIN):
+    """Prices of an instrument between start and end, inclusive, downsampled to at most max_points points."""
+    end = end or date.today()
+    if instrument not in instruments:
+        raise HTTPException(status_code=404, detail=f"Unknown instrument {instrument}")
+    currency = currency.lower()
+    if currency not in CURRENCIES + ("all",):
+        raise HTTPException(status_code=400, detail=f"currency must be one of {', '.join(CURRENCIES)}, all")
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    max_points = min(max(max_points, 3), MAX_POINTS_LIMIT)
+
+    key = (instrument, start, end, currency, max_points)
+    cached = dashboard_cache.fresh(key)
+    if cached is None:
+        # Queries run on the database thread pool so the event loop stays free
+        db = request.app.state.db
+        try:
+            version = await db.read_price_version()
+        except DatabaseError:
+            # A failed query must not be cached as if it were an empty data version
+            raise HTTPException(status_code=503, detail="Price database is not available")
+        cached = dashboard_cache.get(version, key)
+        if cached is None:
+            # The memory-mapped snapshot answers without a query unless the database moved on since it was written
+            snapshot = await asyncio.to_thread(load_fresh_snapshot, instrument, version)
+            rows = None
+            if snapshot is None:
+                try:
+                    rows = await db.read_price_range(start, end, instrument)
+                except DatabaseError:
+                    raise HTTPException(status_code=503, detail="Price database is not available")
+            # Downsampling, cross rates, JSON and gzip are CPU work, so they stay off the event loop too
+            rendered = await asyncio.to_thread(render_prices, snapshot, rows, start, end, currency, max_points)
+            cached = dashboard_cache.put(version, key, rendered)
+
+    return cached_response(request, cached)
+
+@app.get("/metrics")
+async def metrics():
+    """Counters and histograms of the hot paths in the Prometheus text format."""
+    return Response(content=REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/api/loop-lag")
+async def loop_lag():
+    """Event-loop lag in seconds, sampled every 100 ms since startup."""
+    return loop_monitor.stats()
+
+@app.get("/api/ingest/status")
+async def ingest_status():
+    """State of the daily ingest and per-stage record of its last run."""
+    return ingest_runner.status()
 
 @scheduler.scheduled_job('cron', hour='11', minute='19')
 async def fetch_data_job():
-  await populate_new_data_database()
\ No newline at end of file
+  # Runs in the ingest worker thread; the event loop keeps serving requests meanwhile
+  if await ingest_runner.run():
+    dashboard_cache.invalidate()
@@ -0,0 +1,199 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# For operations measured in seconds rather than milliseconds, such as starting a browser
+SLOW_LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram of observed values, typically latencies in seconds.
+
+    Each observation is a bisect and two additions under a lock, so it is cheap
+    enough to record on every request.
+    """
+
+    def __init__(self, buckets=DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        """Record a single observation."""
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    @contextmanager
+    def time(self):
+        """Observe the duration of the enclosed block in seconds."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    @property
+    def count(self) -> int:
+        return sum(self._counts)
+
+    def quantile(self, q: float) -> float:
+        """Returns the upper bound of the bucket holding the q-th quantile, or None if empty."""
+        with self._lock:
+            counts = list(self._counts)
+        total = sum(counts)
+        if not total:
+            return None
+        rank = q * total
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return float("inf")
+
+    def snapshot(self) -> dict:
+        """Returns cumulative bucket counts, total count and sum."""
+        with self._lock:
+            counts = list(self._counts)
+            total_sum = self._sum
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            buckets[bound] = cumulative
+        return {"buckets": buckets, "count": cumulative, "sum": total_sum}
+
+
+class Counter:
+    """Monotonically increasing count, e.g. of requests, errors or rows."""
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class MetricFamily:
+    """
+    A named counter or histogram with one child per combination of label values,
+    rendered in the Prometheus text exposition format.
+
+    Children are created on first use and looked up in a dict afterwards, so
+    recording a value costs a dict lookup plus the child's own update.
+    """
+
+    def __init__(self, name: str, documentation: str, kind: str, labelnames=(), factory=Counter):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self._factory = factory
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, **labels):
+        """The child for the given label values, created on first use."""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._factory())
+        return child
+
+    def attach(self, child, **labels):
+        """Expose an existing Counter or Histogram under the given label values."""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._children[key] = child
+        return child
+
+    # Shortcuts for families without labels
+    def inc(self, amount: float = 1):
+        self.labels().inc(amount)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            children = list(self._children.items())
+        for key, child in children:
+            labels = dict(zip(self.labelnames, key))
+            if self.kind == "counter":
+                lines.append(f"{self.name}{_format_labels(labels)} {_format_value(child.value)}")
+                continue
+            snapshot = child.snapshot()
+            for bound, count in snapshot["buckets"].items():
+                bucket_labels = _format_labels({**labels, "le": _format_value(bound)})
+                lines.append(f"{self.name}_bucket{bucket_labels} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(snapshot['sum'])}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {snapshot['count']}")
+        return lines
+
+
+class Registry:
+    """The metric families of the process, rendered together for the /metrics endpoint."""
+
+    def __init__(self):
+        self._families = {}
+        self._lock = threading.Lock()
+
+    def _family(self, name: str, documentation: str, kind: str, labelnames, factory) -> MetricFamily:
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = MetricFamily(name, documentation, kind, labelnames, factory)
+            elif family.kind != kind or family.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric {name} is already registered as a different {family.kind}")
+            return family
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> MetricFamily:
+        return self._family(name, documentation, "counter", labelnames, Counter)
+
+    def histogram(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_LATENCY_BUCKETS) -> MetricFamily:
+        return self._family(name, documentation, "histogram", labelnames, lambda: Histogram(buckets))
+
+    def render(self) -> str:
+        """All families in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            families = list(self._families.values())
+        lines = []
+        for family in families:
+            lines.extend(family.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
@@ -0,0 +1,15 @@
+-- Key daily prices by (instrument, price_date) so several certificates can be stored.
+-- Existing rows belong to the SwissOne certificate.
+BEGIN;
+
+ALTER TABLE finance.daily_prices
+    ADD COLUMN IF NOT EXISTS instrument text NOT NULL DEFAULT 'DE000A4AJWY5';
+
+ALTER TABLE finance.daily_prices DROP CONSTRAINT IF EXISTS daily_prices_pkey;
+ALTER TABLE finance.daily_prices DROP CONSTRAINT IF EXISTS daily_prices_price_date_key;
+ALTER TABLE finance.daily_prices ADD PRIMARY KEY (instrument, price_date);
+
+-- FX rates are per date, shared by every instrument
+CREATE INDEX IF NOT EXISTS daily_prices_price_date_idx ON finance.daily_prices (price_date);
+
+COMMIT;
@@ -0,0 +1,12 @@
+from datetime import date
+from typing import NamedTuple, Optional
+
+
+class PriceRow(NamedTuple):
+    """One trading day of an instrument, as read from the exchange or an export file."""
+    date: date
+    open: Optional[float]
+    high: Optional[float]
+    low: Optional[float]
+    close: Optional[float]
+    volume: Optional[int]
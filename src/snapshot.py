@@ -0,0 +1,149 @@
+import json
+import logging
+import os
+import shutil
+import time
+from datetime import date, datetime, timezone
+from typing import NamedTuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshots")
+COLUMNS = ("dates", "price", "price_eur")
+
+
+class PriceSnapshot(NamedTuple):
+    """
+    Columnar price history of one instrument. The arrays are read-only memory maps
+    of the snapshot files, so loading one costs no per-row work.
+    """
+    instrument: str
+    version: tuple        # (latest price_date, row count) of the database when written
+    dates: np.ndarray     # datetime64[D], ascending
+    price: np.ndarray     # float64, USD; NaN where the database has no USD price
+    price_eur: np.ndarray # float64
+
+    def between(self, start_date: date, end_date: date) -> tuple:
+        """Zero-copy (dates, price, price_eur) views for a date range, inclusive."""
+        lo = np.searchsorted(self.dates, np.datetime64(start_date, 'D'), side='left')
+        hi = np.searchsorted(self.dates, np.datetime64(end_date, 'D'), side='right')
+        return self.dates[lo:hi], self.price[lo:hi], self.price_eur[lo:hi]
+
+
+def snapshot_dir(directory: str = None) -> str:
+    return directory or os.getenv("SNAPSHOT_DIR", DEFAULT_SNAPSHOT_DIR)
+
+
+def _encode_version(version: tuple) -> list:
+    latest, count = version
+    return [latest.isoformat() if latest else None, count]
+
+
+def _decode_version(version: list) -> tuple:
+    latest, count = version
+    return date.fromisoformat(latest) if latest else None, count
+
+
+def write_snapshot(instrument: str, rows, version: tuple, directory: str = None) -> str:
+    """
+    Write (price_date, price, price_eur) rows, ordered by date, as a new snapshot
+    generation of an instrument and make it current.
+
+    Each generation lives in its own directory and `current.json` is swapped with an
+    atomic rename, so a reader never sees columns from two different generations.
+
+    Returns:
+        str: Directory of the new generation
+    """
+    base = os.path.join(snapshot_dir(directory), instrument)
+    generation = f"{time.time_ns()}-{os.getpid()}"
+    path = os.path.join(base, generation)
+    os.makedirs(path)
+
+    rows = list(rows)
+    np.save(os.path.join(path, "dates.npy"), np.array([row[0] for row in rows], dtype='datetime64[D]'))
+    np.save(os.path.join(path, "price.npy"),
+            np.array([np.nan if row[1] is None else float(row[1]) for row in rows], dtype=np.float64))
+    np.save(os.path.join(path, "price_eur.npy"),
+            np.array([np.nan if row[2] is None else float(row[2]) for row in rows], dtype=np.float64))
+
+    meta = {
+        "generation": generation,
+        "version": _encode_version(version),
+        "rows": len(rows),
+        "written_at": datetime.now(timezone.utc).isoformat(),
+    }
+    temporary = os.path.join(base, f"current.json.{generation}")
+    with open(temporary, "w") as file:
+        json.dump(meta, file)
+    os.replace(temporary, os.path.join(base, "current.json"))
+
+    # Older generations can go; open memory maps keep their data until unmapped
+    for name in os.listdir(base):
+        if name != generation and os.path.isdir(os.path.join(base, name)):
+            shutil.rmtree(os.path.join(base, name), ignore_errors=True)
+    return path
+
+
+_loaded = {}
+
+
+def load_snapshot(instrument: str, directory: str = None):
+    """
+    Memory-map the current snapshot of an instrument.
+
+    The mapped arrays are kept between calls and only reopened when a newer
+    generation has been written.
+
+    Returns:
+        PriceSnapshot or None if the instrument has no snapshot
+    """
+    base = os.path.join(snapshot_dir(directory), instrument)
+    try:
+        with open(os.path.join(base, "current.json")) as file:
+            meta = json.load(file)
+    except (FileNotFoundError, ValueError):
+        return None
+
+    key = (base, meta["generation"])
+    snapshot = _loaded.get(base)
+    if snapshot is not None and snapshot[0] == key:
+        return snapshot[1]
+
+    path = os.path.join(base, meta["generation"])
+    try:
+        arrays = [np.load(os.path.join(path, f"{column}.npy"), mmap_mode='r') for column in COLUMNS]
+    except (FileNotFoundError, ValueError) as e:
+        logger.warning(f"Snapshot of {instrument} could not be opened: {e}")
+        return None
+    snapshot = PriceSnapshot(instrument, _decode_version(meta["version"]), *arrays)
+    _loaded[base] = (key, snapshot)
+    return snapshot
+
+
+def load_fresh_snapshot(instrument: str, version: tuple, directory: str = None):
+    """The snapshot of an instrument if it was written at the given database version, else None."""
+    snapshot = load_snapshot(instrument, directory)
+    if snapshot is None or snapshot.version != tuple(version):
+        return None
+    return snapshot
+
+
+def refresh_snapshots(db, directory: str = None) -> int:
+    """
+    Rewrite the snapshot of every stored instrument from the database.
+
+    Args:
+        db (DatabaseClient): A connected client
+
+    Returns:
+        int: Number of snapshots written
+    """
+    version = db.read_price_version()
+    written = 0
+    for instrument in db.read_latest_price_dates():
+        write_snapshot(instrument, db.read_all_prices(instrument), version, directory)
+        written += 1
+    return written
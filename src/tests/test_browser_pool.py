@@ -0,0 +1,47 @@
+import time
+
+from browser_pool import BrowserPool
+
+
+class FakeDriver:
+    def __init__(self):
+        self.quit_called = False
+
+    def execute_script(self, script):
+        return 1
+
+    def quit(self):
+        self.quit_called = True
+
+
+def test_reap_idle_quits_only_browsers_idle_past_max_idle():
+    drivers = []
+
+    def create_driver():
+        drivers.append(FakeDriver())
+        return drivers[-1]
+
+    pool = BrowserPool(create_driver, max_size=2, max_idle=600)
+    with pool.session(), pool.session():
+        pass
+    stale, fresh = pool._idle
+    stale.last_used = time.monotonic() - 601
+
+    assert pool.reap_idle() == 1
+    assert stale.driver.quit_called and not fresh.driver.quit_called
+    assert list(pool._idle) == [fresh]
+    assert pool.recycled == 1
+
+
+def test_reaper_thread_closes_idle_browsers():
+    driver = FakeDriver()
+    pool = BrowserPool(lambda: driver, max_idle=0.05)
+    with pool.session():
+        pass
+
+    deadline = time.monotonic() + 2
+    while not driver.quit_called and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert driver.quit_called
+    assert not pool._idle
@@ -0,0 +1,276 @@
+import asyncio
+import json
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+import fx_cache
+import fx_client
+from benchmarks.suite import serve
+from fx_cache import FXRateCache
+from fx_client import AsyncFXClient, CircuitBreaker, FX_FALLBACKS, PROVIDERS
+
+
+class FrankfurterStub(BaseHTTPRequestHandler):
+    """
+    Local Frankfurter with a fixed set of publication days. Like the real API, a
+    single-day request for a day without a publication answers with the last rate
+    before it. Every request path is recorded; single-day requests can be made
+    slow or failing.
+    """
+    rates = {}
+    fail_series = False
+    fail_single_day = False
+    delay = 0.0
+    requests = []
+
+    def do_GET(self):
+        path = self.path.split("?")[0].strip("/")
+        self.requests.append(path)
+        if ".." not in path:
+            time.sleep(self.delay)
+            if self.fail_single_day:
+                self.send_error(500)
+                return
+        if ".." in path:
+            if self.fail_series:
+                self.send_error(500)
+                return
+            start, end = (date.fromisoformat(part) for part in path.split(".."))
+            body = {"rates": {day.isoformat(): {"USD": rate} for day, rate in self.rates.items() if start <= day <= end}}
+        else:
+            day = date.fromisoformat(path)
+            published = [d for d in self.rates if d <= day]
+            body = {"rates": {"USD": self.rates[max(published)]}} if published else {"rates": {}}
+        payload = json.dumps(body).encode()
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client cancelled a hedged request that lost the race
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def frankfurter(monkeypatch, tmp_path):
+    """Points the client at a fresh stub and an empty rate cache."""
+    class Stub(FrankfurterStub):
+        rates = {}
+        fail_series = False
+        fail_single_day = False
+        delay = 0.0
+        requests = []
+
+    monkeypatch.setattr(fx_client, "FRANKFURTER_URL", serve(Stub))
+    monkeypatch.setattr(fx_cache, "_default_cache", FXRateCache(str(tmp_path / "fx_rates.sqlite3")))
+    monkeypatch.delenv("CURRENCYLAYER_API_KEY", raising=False)
+    # Provider health is process-wide; start every test with closed breakers and no latency history
+    for health in PROVIDERS.values():
+        monkeypatch.setattr(health, "breaker", CircuitBreaker())
+        monkeypatch.setattr(health, "average_latency", None)
+    yield Stub
+    fx_cache._default_cache.close()
+
+
+class CurrencylayerStub(BaseHTTPRequestHandler):
+    """Local Currencylayer answering every historical request with a fixed quote."""
+    rate = 1.2
+    requests = []
+
+    def do_GET(self):
+        self.requests.append(self.path)
+        payload = json.dumps({"success": True, "quotes": {"EURUSD": self.rate}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def currencylayer(monkeypatch, frankfurter):
+    """Enables Currencylayer as the second historical provider, behind a local stub."""
+    class Stub(CurrencylayerStub):
+        requests = []
+
+    monkeypatch.setattr(fx_client, "CURRENCYLAYER_URL", serve(Stub))
+    monkeypatch.setenv("CURRENCYLAYER_API_KEY", "test")
+    return Stub
+
+
+def run(coroutine_function, *args):
+    async def call():
+        client = AsyncFXClient()
+        try:
+            return await coroutine_function(client, *args)
+        finally:
+            await client.aclose()
+    return asyncio.run(call())
+
+
+def test_get_frankfurter_rates_reads_time_series(frankfurter):
+    frankfurter.rates = {date(2024, 3, 1): 1.08, date(2024, 3, 4): 1.09}
+
+    rates = run(AsyncFXClient.get_frankfurter_rates, date(2024, 3, 1), date(2024, 3, 4))
+
+    assert rates == {date(2024, 3, 1): 1.08, date(2024, 3, 4): 1.09}
+    assert frankfurter.requests == ["2024-03-01..2024-03-04"]
+
+
+def test_get_frankfurter_rates_is_empty_when_the_request_fails(frankfurter):
+    frankfurter.fail_series = True
+
+    assert run(AsyncFXClient.get_frankfurter_rates, date(2024, 3, 1), date(2024, 3, 4)) == {}
+
+
+def test_weekends_and_holidays_take_the_previous_publication(frankfurter):
+    frankfurter.rates = {date(2023, 12, 29): 1.10, date(2024, 1, 2): 1.09, date(2024, 1, 5): 1.095}
+    # New Year's Day and a weekend, plus a range that opens on the holiday
+    days = [date(2024, 1, 1), date(2024, 1, 2), date(2024, 1, 6), date(2024, 1, 7)]
+
+    converted = run(AsyncFXClient.convert_eur_to_usd_many, [100.0] * len(days), days)
+
+    assert converted == pytest.approx([110.0, 109.0, 109.5, 109.5])
+    # One time series request, starting a week early to find the rate before the holiday
+    assert frankfurter.requests == ["2023-12-25..2024-01-07"]
+
+
+def test_time_series_failure_falls_back_to_single_day_lookups(frankfurter):
+    frankfurter.rates = {date(2024, 3, 1): 1.08, date(2024, 3, 4): 1.09}
+    frankfurter.fail_series = True
+    single_day = FX_FALLBACKS.labels(kind="single_day")
+    before = single_day.value
+
+    converted = run(AsyncFXClient.convert_eur_to_usd_many, [10.0, 10.0], [date(2024, 3, 2), date(2024, 3, 4)])
+
+    assert converted == pytest.approx([10.8, 10.9])
+    assert sorted(frankfurter.requests[1:]) == ["2024-03-02", "2024-03-04"]
+    assert single_day.value - before == 2
+    # The per-day results are cached as well
+    assert fx_cache.get_cache().get(date(2024, 3, 2)) == 1.08
+
+
+def test_cached_rates_are_not_requested_again(frankfurter):
+    frankfurter.rates = {date(2024, 3, 1): 1.08, date(2024, 3, 4): 1.09}
+    days = [date(2024, 3, 1), date(2024, 3, 2), date(2024, 3, 4)]
+
+    first = run(AsyncFXClient.convert_eur_to_usd_many, [1.0, 1.0, 1.0], days)
+    requests = len(frankfurter.requests)
+    second = run(AsyncFXClient.convert_eur_to_usd_many, [2.0, 2.0, 2.0], days)
+
+    assert first == pytest.approx([1.08, 1.08, 1.09])
+    assert second == pytest.approx([2.16, 2.16, 2.18])
+    assert len(frankfurter.requests) == requests == 1
+
+
+def test_partially_cached_dates_only_request_the_missing_range(frankfurter):
+    frankfurter.rates = {date(2024, 3, 4): 1.09, date(2024, 3, 5): 1.07}
+    fx_cache.get_cache().put(date(2024, 3, 1), 1.5)
+
+    converted = run(AsyncFXClient.convert_eur_to_usd_many, [1.0, 1.0], [date(2024, 3, 1), date(2024, 3, 5)])
+
+    assert converted == pytest.approx([1.5, 1.07])
+    assert frankfurter.requests == ["2024-02-27..2024-03-05"]
+
+
+def test_slow_primary_is_hedged_and_the_losing_request_cancelled(frankfurter, currencylayer, monkeypatch):
+    frankfurter.rates = {date(2024, 3, 1): 1.08}
+    frankfurter.delay = 1.0
+    monkeypatch.setattr(fx_client, "HEDGE_DELAY", 0.05)
+    hedges = FX_FALLBACKS.labels(kind="hedge")
+    before = hedges.value
+    cancelled = []
+
+    async def call():
+        client = AsyncFXClient()
+        get_frankfurter_rate = client.get_frankfurter_rate
+
+        async def tracked(day):
+            try:
+                return await get_frankfurter_rate(day)
+            except asyncio.CancelledError:
+                cancelled.append(day)
+                raise
+
+        client.get_frankfurter_rate = tracked
+        try:
+            started = time.perf_counter()
+            rate = await client.get_eur_to_usd_rate(date(2024, 3, 1))
+            return rate, time.perf_counter() - started
+        finally:
+            await client.aclose()
+
+    rate, elapsed = asyncio.run(call())
+
+    assert rate == 1.2
+    assert elapsed < 0.5
+    assert hedges.value - before == 1
+    assert cancelled == [date(2024, 3, 1)]
+    # Losing the race is not a failure of the slow provider
+    assert PROVIDERS["frankfurter"].breaker.failures == 0
+
+
+def test_failing_primary_fails_over_without_waiting_for_the_hedge_delay(frankfurter, currencylayer, monkeypatch):
+    frankfurter.fail_single_day = True
+    monkeypatch.setattr(fx_client, "HEDGE_DELAY", 5.0)
+    failovers = FX_FALLBACKS.labels(kind="failover")
+    hedges = FX_FALLBACKS.labels(kind="hedge")
+    failovers_before, hedges_before = failovers.value, hedges.value
+
+    started = time.perf_counter()
+    rate = run(AsyncFXClient.get_eur_to_usd_rate, date(2024, 3, 1))
+
+    assert rate == 1.2
+    assert time.perf_counter() - started < 2.0
+    assert failovers.value - failovers_before == 1
+    assert hedges.value == hedges_before
+    assert len(currencylayer.requests) == 1
+    assert PROVIDERS["frankfurter"].breaker.failures == 1
+
+
+def test_breaker_opens_after_five_failures_and_lets_one_trial_through(frankfurter):
+    frankfurter.rates = {date(2024, 3, 1): 1.08}
+    frankfurter.fail_single_day = True
+    breaker = PROVIDERS["frankfurter"].breaker
+    breaker.reset_timeout = 0.2
+
+    async def rates(count):
+        client = AsyncFXClient()
+        try:
+            return await asyncio.gather(*(client.get_frankfurter_rate(date(2024, 3, 1)) for _ in range(count)))
+        finally:
+            await client.aclose()
+
+    for _ in range(5):
+        assert asyncio.run(rates(1)) == [None]
+    assert breaker.state == "open"
+
+    # While open, no request reaches the provider
+    requests = len(frankfurter.requests)
+    assert asyncio.run(rates(3)) == [None, None, None]
+    assert len(frankfurter.requests) == requests
+
+    # After reset_timeout a single trial goes through; its failure re-opens the breaker
+    time.sleep(0.25)
+    assert breaker.state == "half-open"
+    assert asyncio.run(rates(3)) == [None, None, None]
+    assert len(frankfurter.requests) == requests + 1
+    assert breaker.state == "open"
+
+    # A successful trial closes it again
+    frankfurter.fail_single_day = False
+    time.sleep(0.25)
+    assert asyncio.run(rates(1)) == [1.08]
+    assert breaker.state == "closed"
+    assert breaker.failures == 0
@@ -0,0 +1,98 @@
+import os
+import shutil
+from datetime import date
+
+import pytest
+
+import instruments
+import web_scraper
+from benchmarks.suite import QuietFileHandler, serve
+from instruments import DEFAULT_INSTRUMENT
+from web_scraper import HostRateLimiter, extract_historical_prices
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def read_fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as file:
+        return file.read()
+
+
+@pytest.fixture
+def exchange(monkeypatch, tmp_path):
+    """
+    Serves a saved instrument page from a local web server and replaces the
+    Selenium fetch with a stub that returns the fully rendered page.
+    Returns a function that selects which fixture the server answers with.
+    """
+    page_dir = tmp_path / "etc" / DEFAULT_INSTRUMENT.isin / DEFAULT_INSTRUMENT.slug
+    page_dir.mkdir(parents=True)
+    monkeypatch.setattr(instruments, "BOERSE_URL", serve(QuietFileHandler, str(tmp_path)))
+    monkeypatch.setattr(web_scraper, "rate_limiter", HostRateLimiter(0))
+
+    rendered = []
+
+    def get_page(instrument=DEFAULT_INSTRUMENT):
+        rendered.append(instrument)
+        return read_fixture("history_table.html")
+
+    monkeypatch.setattr(web_scraper, "get_page", get_page)
+
+    def serve_fixture(name: str):
+        shutil.copy(os.path.join(FIXTURES, name), page_dir / "index.html")
+        return rendered
+
+    return serve_fixture
+
+
+def test_table_in_server_html_is_read_without_selenium(exchange):
+    rendered = exchange("history_table.html")
+    http_fetches = web_scraper.fetch_counts["http"]
+
+    rows = extract_historical_prices()
+
+    assert [row.date for row in rows] == [date(2025, 9, 12), date(2025, 9, 11), date(2025, 9, 10), date(2025, 9, 9)]
+    assert rows[0].open == 1234.5 and rows[0].close == 1238.75 and rows[0].volume == 120
+    assert rows[2].volume is None
+    assert rows[3].open is None and rows[3].close == 1216.0
+    assert rendered == []
+    assert web_scraper.fetch_counts["http"] == http_fetches + 1
+
+
+@pytest.mark.parametrize("fixture", ["history_placeholder.html", "history_empty_table.html"])
+def test_missing_or_empty_table_falls_back_to_selenium(exchange, fixture):
+    rendered = exchange(fixture)
+    selenium_fetches = web_scraper.fetch_counts["selenium"]
+
+    rows = extract_historical_prices()
+
+    assert rendered == [DEFAULT_INSTRUMENT]
+    assert len(rows) == 4
+    assert web_scraper.fetch_counts["selenium"] == selenium_fetches + 1
+
+
+def test_failed_http_fetch_falls_back_to_selenium(exchange):
+    rendered = exchange("history_table.html")
+    # No page is served under this slug, so the plain fetch gets a 404
+    unknown = DEFAULT_INSTRUMENT._replace(slug="unknown")
+
+    rows = extract_historical_prices(instrument=unknown)
+
+    assert rendered == [unknown]
+    assert len(rows) == 4
+
+
+def test_watermark_without_new_rows_does_not_fall_back(exchange):
+    rendered = exchange("history_table.html")
+
+    assert extract_historical_prices(watermark=date(2025, 9, 12)) == []
+    assert rendered == []
+
+
+def test_watermark_returns_only_newer_rows(exchange):
+    rendered = exchange("history_table.html")
+
+    rows = extract_historical_prices(watermark=date(2025, 9, 10))
+
+    assert [row.date for row in rows] == [date(2025, 9, 12), date(2025, 9, 11)]
+    assert rendered == []
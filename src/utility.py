@@ -1,12 +1,21 @@
-from web_scraper import extract_historical_prices
+from web_scraper import scrape_instruments
 from database_client import DatabaseClient
-from currency_convert import convert_eur_to_usd
+from instruments import load_instruments
+from currency_convert import convert_eur_to_usd_many
 from chart import plot_historical_prices
-from file_reader import parse_stock_data
+from file_reader import parse_stock_data, iter_stock_data_chunks, ParseSummary
+from instruments import DEFAULT_ISIN
+from snapshot import refresh_snapshots
+from fx_table import get_fx_table
+from metrics import REGISTRY
+import contextlib
 import datetime
 import os
+import time
 from dotenv import load_dotenv
 
+INGEST_ROWS = REGISTRY.counter("ingest_rows_total", "Rows written by the daily ingest, by result (inserted or skipped)", ("result",))
+
 def string_to_float(historical_prices):
     closing_prices_eur = []
     for row in historical_prices:
@@ -42,29 +51,33 @@ def populate_database():
     )
     db.connect()
 
-    historical_prices = extract_historical_prices()
-    closing_prices_eur = string_to_float(historical_prices)
+    scraped = scrape_instruments(load_instruments(), max_workers=int(os.getenv("SCRAPE_WORKERS", "4")))
     # dates, opens, highs, lows, closing_prices_eur, volumes = parse_stock_data("src/stock_data.txt")
+    for instrument, historical_prices in scraped.items():
+        closing_prices_eur = [row.close for row in historical_prices]
+        new_dates = [row.date for row in historical_prices]
 
-    dates = ([row['Datum'] for row in historical_prices])
-    new_dates = []
-    for date_str in dates:
-        day, month, year = map(int, date_str.split('.'))
-        date_object = datetime.date(int(year), int(month), int(day))
-        new_dates.append(date_object)
-
-    closing_price_usd = []
-    for i in len(closing_prices_eur):
-        closing_price_usd.append(convert_eur_to_usd(closing_prices_eur[i], new_dates[i]))
+        closing_price_usd = convert_eur_to_usd_many(closing_prices_eur, new_dates)
 
-    print(new_dates)
+        print(instrument, new_dates)
 
-    for date, price, price_eur in zip(new_dates, closing_price_usd, closing_prices_eur):
-        db.insert_price(price, price_eur, date)
+        db.insert_prices_bulk(zip(new_dates, closing_price_usd, closing_prices_eur), instrument=instrument)
 
     db.disconnect()
 
-def populate_new_data_database():
+def populate_new_data_database(stage=None):
+    """
+    Scrape the latest prices and store the dates that are not in the database yet.
+
+    Args:
+        stage: Optional callable taking a stage name ("scrape", "convert", "write", "snapshot")
+            and returning a context manager that yields a dict for stage details,
+            such as IngestRunner.stage. Used to report progress of each stage.
+
+    Returns:
+        tuple: (inserted, skipped) row counts
+    """
+    stage = stage or (lambda name: contextlib.nullcontext({}))
     load_dotenv()
     db = DatabaseClient(
         host=os.getenv("DB_HOST"),
@@ -75,25 +88,54 @@ def populate_new_data_database():
         sslmode="allow"
     )
     db.connect()
+    try:
+        with stage("scrape") as details:
+            # Only rows newer than what is already stored need parsing
+            watermarks = db.read_latest_price_dates()
+            scraped = scrape_instruments(load_instruments(), watermarks,
+                                         max_workers=int(os.getenv("SCRAPE_WORKERS", "4")))
+            details["rows"] = {instrument: len(rows) for instrument, rows in scraped.items()}
 
-    historical_prices = extract_historical_prices()
-    closing_prices_eur = string_to_float(historical_prices)
+        with stage("convert") as details:
+            new_rows = {}
+            for instrument, rows in scraped.items():
+                if not rows:
+                    continue
+                print(instrument, [row.date for row in rows])
+                # One query for every date the scrape covers, instead of one existence check per row
+                existing_dates = db.read_price_dates(min(row.date for row in rows), max(row.date for row in rows), instrument)
+                new_rows[instrument] = [row for row in rows if row.date not in existing_dates]
 
-    dates = ([row['Datum'] for row in historical_prices])
-    new_dates = []
-    for date_str in dates:
-        day, month, year = map(int, date_str.split('.'))
-        date_object = datetime.date(int(year), int(month), int(day))
-        new_dates.append(date_object)
+            # FX rates do not depend on the instrument, so all new rows are converted in one batch
+            all_new_rows = [row for rows in new_rows.values() for row in rows]
+            prices_usd = iter(convert_eur_to_usd_many([row.close for row in all_new_rows],
+                                                      [row.date for row in all_new_rows]))
+            details["rows"] = len(all_new_rows)
 
-    print(new_dates)
+        with stage("write") as details:
+            inserted = skipped = 0
+            for instrument, rows in new_rows.items():
+                instrument_inserted, instrument_skipped = db.insert_prices_bulk(
+                    ((row.date, price_usd, row.close) for row, price_usd in zip(rows, prices_usd)),
+                    instrument=instrument
+                )
+                inserted += instrument_inserted
+                skipped += instrument_skipped
+            details["inserted"] = inserted
+            details["skipped"] = skipped
+            INGEST_ROWS.labels(result="inserted").inc(inserted)
+            INGEST_ROWS.labels(result="skipped").inc(skipped)
 
-    for date, price_eur in zip(new_dates, closing_prices_eur):
-        if not db.price_exists(date):
-            price_usd = convert_eur_to_usd(price_eur, date)
-            db.insert_price(price_usd, price_eur, date)
-
-    db.disconnect()
+        with stage("snapshot") as details:
+            # Readers fall back to the database while a snapshot is stale, so a failure here is not fatal
+            try:
+                details["instruments"] = refresh_snapshots(db)
+            except Exception as e:
+                print(f"Warning: Could not refresh price snapshots: {e}")
+                details["error"] = str(e)
+        return inserted, skipped
+    finally:
+        db.disconnect()
 
 def update_conversion_rates():
     load_dotenv()
@@ -107,11 +149,17 @@ def update_conversion_rates():
     )
     db.connect()
 
-    prices = db.read_all_prices()
-    for price_date, price, price_eur in prices:
-        usd = convert_eur_to_usd(float(price_eur), price_date)
-        db.update_price(price_date=price_date, price=usd)
+    for instrument in db.read_latest_price_dates():
+        prices = [(price_date, price_eur) for price_date, _, price_eur in db.read_all_prices(instrument)
+                  if price_eur is not None]
+        price_dates = [price_date for price_date, _ in prices]
+        prices_usd = convert_eur_to_usd_many([float(price_eur) for _, price_eur in prices], price_dates)
+        # One UPDATE ... FROM (VALUES ...) per instrument instead of a statement and commit per row
+        updated = db.update_prices(zip(price_dates, prices_usd), instrument=instrument)
+        print(f"Updated USD prices of {updated} rows of {instrument}")
 
+    # Rewriting prices keeps the (latest date, row count) version, so snapshots would not look stale
+    refresh_snapshots(db)
     db.disconnect()
 
 # New function to populate EURtoUSD_fx_rate column
@@ -127,40 +175,73 @@ def populate_fx_rate_column():
     )
     db.connect()
 
-    import csv
-
-    # Load FX rates from ECB CSV file into a dictionary
-    fx_rates = {}
-    csv_path = os.path.join(os.path.dirname(__file__), '../EuropeanCentralBank_Euro_FX - eurofxref-hist.csv')
-    with open(csv_path, newline='', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            date_str = row['Date']
-            usd_rate = row['USD']
-            if usd_rate and usd_rate != 'N/A':
-                fx_rates[date_str] = float(usd_rate)
-
-    prices = db.read_all_prices()
-    for price_date, price, price_eur in prices:
-        # Convert price_date to string in YYYY-MM-DD format
-        date_str = price_date.strftime('%Y-%m-%d')
-        fx_rate = fx_rates.get(date_str)
-        if fx_rate is not None:
-            try:
-                query = """
-                    UPDATE finance.daily_prices
-                    SET EURtoUSD_fx_rate = %s
-                    WHERE price_date = %s;
-                """
-                db.cursor.execute(query, (fx_rate, price_date))
-                db.connection.commit()
-                print(f"Updated EURtoUSD_fx_rate for {price_date}: {fx_rate}")
-            except Exception as e:
-                print(f"Error updating EURtoUSD_fx_rate for {price_date}: {e}")
-        else:
-            print(f"No FX rate found for {price_date}")
+    # A rate for every calendar day, so weekends and holidays get the last published rate
+    fx_rates = get_fx_table().daily_rates("USD")
+    updated = db.update_fx_rates(fx_rates)
+    missing = db.count_missing_fx_rates()
+    print(f"Updated EURtoUSD_fx_rate for {updated} rows, {missing} rows still without FX rate")
+    refresh_snapshots(db)
     db.disconnect()
 
+def import_file(path, instrument=DEFAULT_ISIN, batch_size=10000):
+    """
+    Load a stock_data.txt-style export into finance.daily_prices without scraping
+    or network access. The file is streamed in batches; each close is converted to
+    USD with the ECB rate on or before its date.
+
+    Returns:
+        tuple: (inserted, skipped) row counts
+    """
+    load_dotenv()
+    db = DatabaseClient(
+        host=os.getenv("DB_HOST"),
+        port=int(os.getenv("DB_PORT")),
+        dbname=os.getenv("DB_NAME"),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        sslmode="allow"
+    )
+    db.connect()
+
+    # Weekends and holidays have no ECB rate, so the table returns the latest one before them
+    fx_table = get_fx_table()
+
+    summary = ParseSummary()
+    inserted = skipped = without_rate = 0
+    started = time.perf_counter()
+    try:
+        for batch in iter_stock_data_chunks(path, batch_size, summary):
+            rates = fx_table.rates_for("USD", [row.date for row in batch]).tolist()
+            rows = []
+            for row, rate in zip(batch, rates):
+                if rate != rate:  # NaN: before the first ECB rate
+                    without_rate += 1
+                    rows.append((row.date, None, row.close))
+                else:
+                    rows.append((row.date, row.close * rate, row.close))
+            try:
+                batch_inserted, batch_skipped = db.insert_prices_bulk(rows, instrument=instrument)
+            except Exception:
+                # The failed batch was rolled back; earlier batches stay committed
+                print(f"Import of {path} stopped after {inserted} inserted, {skipped} skipped rows: "
+                      f"the batch of {len(rows)} rows from {batch[0].date} to {batch[-1].date} failed")
+                raise
+            inserted += batch_inserted
+            skipped += batch_skipped
+            elapsed = time.perf_counter() - started
+            print(f"{summary.rows} rows read, {inserted} inserted, {skipped} skipped "
+                  f"({summary.rows / elapsed:.0f} rows/s)")
+        # New rows change the (latest date, row count) version, which makes every snapshot stale
+        written = refresh_snapshots(db)
+        print(f"Wrote price snapshots for {written} instruments")
+    finally:
+        db.disconnect()
+
+    elapsed = time.perf_counter() - started
+    print(f"Imported {path} for {instrument} in {elapsed:.2f}s: {summary}, {inserted} inserted, "
+          f"{skipped} already stored, {without_rate} without a USD rate")
+    return inserted, skipped
+
 def get_dates_from(start_date):
     today = datetime.date.today()
     delta = today - start_date
@@ -179,30 +260,26 @@ def update_price_with_fx_rate():
     )
     db.connect()
 
-    # Read all prices and FX rates
-    query = """
-        SELECT price_date, price_eur, EURtoUSD_fx_rate
-        FROM finance.daily_prices;
-    """
-    db.cursor.execute(query)
-    rows = db.cursor.fetchall()
+    updated = db.recompute_usd_prices()
+    missing = db.count_missing_fx_rates()
+    print(f"Updated price for {updated} rows, {missing} rows missing price_eur or EURtoUSD_fx_rate")
+    refresh_snapshots(db)
+    db.disconnect()
 
-    for price_date, price_eur, fx_rate in rows:
-        if price_eur is not None and fx_rate is not None:
-            new_price = float(price_eur) * float(fx_rate)
-            try:
-                update_query = """
-                    UPDATE finance.daily_prices
-                    SET price = %s
-                    WHERE price_date = %s;
-                """
-                db.cursor.execute(update_query, (new_price, price_date))
-                db.connection.commit()
-                print(f"Updated price for {price_date}: {new_price}")
-            except Exception as e:
-                print(f"Error updating price for {price_date}: {e}")
-        else:
-            print(f"Missing price_eur or EURtoUSD_fx_rate for {price_date}")
+def export_snapshots():
+    load_dotenv()
+    db = DatabaseClient(
+        host=os.getenv("DB_HOST"),
+        port=int(os.getenv("DB_PORT")),
+        dbname=os.getenv("DB_NAME"),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        sslmode="allow"
+    )
+    db.connect()
+
+    written = refresh_snapshots(db)
+    print(f"Wrote price snapshots for {written} instruments")
     db.disconnect()
 
 if __name__ == "__main__":
@@ -213,8 +290,12 @@ if __name__ == "__main__":
         "populate_database",
         "populate_new_data_database",
         "populate_fx_rate_column",
-        "update_price_with_fx_rate"
+        "update_price_with_fx_rate",
+        "export_snapshots",
+        "import_file"
     ], help="Function to execute")
+    parser.add_argument("--path", type=str, help="Price file to load, for import_file")
+    parser.add_argument("--instrument", type=str, default=DEFAULT_ISIN, help="ISIN of the imported prices")
     args = parser.parse_args()
 
     if args.function == "update_conversion_rates":
@@ -226,4 +307,10 @@ if __name__ == "__main__":
     elif args.function == "populate_fx_rate_column":
         populate_fx_rate_column()
     elif args.function == "update_price_with_fx_rate":
-        update_price_with_fx_rate()
\ No newline at end of file
+        update_price_with_fx_rate()
+    elif args.function == "export_snapshots":
+        export_snapshots()
+    elif args.function == "import_file":
+        if not args.path:
+            parser.error("import_file requires --path")
+        import_file(args.path, args.instrument)
\ No newline at end of file
@@ -3,7 +3,16 @@ from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from bs4 import BeautifulSoup
+from browser_pool import BrowserPool
+from metrics import REGISTRY, SLOW_LATENCY_BUCKETS
+from history_parser import parse_history_table
+from instruments import DEFAULT_INSTRUMENT
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+import atexit
+import os
+import requests
+import threading
 import time
 import random
 import logging
@@ -20,6 +29,40 @@ PROXIES = [
     # Add proxies here or use a proxy service API
 ]
 
+# Keep-alive session for the plain HTTP fast path
+http_session = requests.Session()
+http_session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=4))
+http_session.mount("http://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=4))
+http_session.headers.update({
+    "User-Agent": UserAgent().random,
+    "Accept": "text/html,application/xhtml+xml",
+    "Accept-Language": "de-DE,de;q=0.9,en;q=0.8",
+})
+
+# How often each fetch method supplied the history table, to track the fallback rate
+fetch_counts = {"http": 0, "selenium": 0}
+fetch_counts_lock = threading.Lock()
+
+class HostRateLimiter:
+    """Spaces requests to the same host at least `min_interval` seconds apart, across threads."""
+
+    def __init__(self, min_interval: float):
+        self.min_interval = min_interval
+        self._next_allowed = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url: str):
+        """Block until a request to the host of `url` may be sent."""
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_allowed.get(host, now))
+            self._next_allowed[host] = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+rate_limiter = HostRateLimiter(float(os.getenv("SCRAPE_HOST_INTERVAL", "1.0")))
+
 def get_random_proxy():
     return random.choice(PROXIES) if PROXIES else None
 
@@ -27,9 +70,8 @@ def retry_if_exception(exception):
     """Retry on specific exceptions."""
     return isinstance(exception, (Exception,))
 
-@retry(retry_on_exception=retry_if_exception, stop_max_attempt_number=3, wait_fixed=2000)
-def get_page():
-    """Fetch the page using Selenium with anti-detection measures."""
+def create_driver():
+    """Start a headless Chrome with anti-detection measures."""
     # Initialize User-Agent rotator
     ua = UserAgent()
     user_agent = ua.random
@@ -53,84 +95,130 @@ def get_page():
         options.add_argument(f'--proxy-server={proxy}')
         logger.info(f"Using proxy: {proxy}")
 
-    driver = None
-    try:
-        driver = webdriver.Chrome(options=options)
-        driver.execute_cdp_cmd('Network.setUserAgentOverride', {"userAgent": user_agent})
-
-        url = "https://www.boerse-duesseldorf.de/etc/DE000A4AJWY5/encore-issuances-s-a-comp-102-oend-z-25-unl-swissone-idx/#instrument-historie"
-        logger.info(f"Fetching URL: {url}")
-
-        # Load the page
-        driver.get(url)
-
-        # Wait for the table to load (adjust selector as needed)
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.ID, 'instrument-historie'))
-        )
+    driver = webdriver.Chrome(options=options)
+    driver.execute_cdp_cmd('Network.setUserAgentOverride', {"userAgent": user_agent})
+    return driver
+
+# Warm browsers are kept between scrapes instead of launching Chrome for every page
+browser_pool = BrowserPool(
+    create_driver,
+    max_size=int(os.getenv("BROWSER_POOL_SIZE", "1")),
+    max_pages=int(os.getenv("BROWSER_MAX_PAGES", "50"))
+)
+atexit.register(browser_pool.close)
+
+SCRAPE_PHASE_SECONDS = REGISTRY.histogram(
+    "scrape_phase_duration_seconds",
+    "Duration of scrape phases: browser_start, page_load (Selenium), http_fetch and parse",
+    ("phase",), buckets=SLOW_LATENCY_BUCKETS
+)
+SCRAPE_PHASE_SECONDS.attach(browser_pool.start_latency, phase="browser_start")
+page_load_seconds = SCRAPE_PHASE_SECONDS.labels(phase="page_load")
+http_fetch_seconds = SCRAPE_PHASE_SECONDS.labels(phase="http_fetch")
+parse_seconds = SCRAPE_PHASE_SECONDS.labels(phase="parse")
+SCRAPE_FETCHES = REGISTRY.counter("scrape_fetches_total", "Instrument pages fetched, by method (http or selenium)", ("method",))
 
-        # Random delay to mimic human behavior
-        time.sleep(random.uniform(3, 7))
-
-        # Scroll to ensure all dynamic content loads (optional)
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(random.uniform(1, 3))
-
-        # Get the page source and parse with BeautifulSoup
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
-        return soup
+@retry(retry_on_exception=retry_if_exception, stop_max_attempt_number=3, wait_fixed=2000)
+def get_page(instrument=DEFAULT_INSTRUMENT):
+    """Fetch the rendered page HTML of an instrument using a pooled Selenium browser."""
+    try:
+        with browser_pool.session() as driver:
+            url = f"{instrument.url}#instrument-historie"
+            logger.info(f"Fetching URL: {url}")
+
+            # Load the page
+            rate_limiter.wait(url)
+            with page_load_seconds.time():
+                driver.get(url)
+
+                # Wait for the table to load (adjust selector as needed)
+                WebDriverWait(driver, 10).until(
+                    EC.presence_of_element_located((By.ID, 'instrument-historie'))
+                )
+
+            # Random delay to mimic human behavior
+            time.sleep(random.uniform(3, 7))
+
+            # Scroll to ensure all dynamic content loads (optional)
+            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+            time.sleep(random.uniform(1, 3))
+            return driver.page_source
     except Exception as e:
         logger.error(f"Error loading page: {e}")
         raise
-    finally:
-        if driver:
-            driver.quit()
-            logger.info("Browser closed")
-
-def extract_historical_prices():
-    """Extract historical price data from the page."""
-    soup = get_page()
-    if not soup:
-        logger.error("Failed to retrieve page content")
-        return []
 
-    historical_data = []
+def get_page_http(instrument=DEFAULT_INSTRUMENT):
+    """Fetch the server-rendered page HTML of an instrument with the pooled HTTP session, without a browser."""
+    rate_limiter.wait(instrument.url)
+    with http_fetch_seconds.time():
+        response = http_session.get(instrument.url, timeout=10)
+    response.raise_for_status()
+    # Return bytes so the parser honours the page's declared charset
+    return response.content
+
+def extract_historical_prices(watermark=None, instrument=DEFAULT_INSTRUMENT):
+    """
+    Extract historical price data of an instrument as PriceRow entries, newest first.
+    Tries a plain HTTP fetch first and only renders the page in Selenium
+    when the history table is missing from the server HTML.
+
+    With a watermark date, only rows newer than it are parsed and returned.
+    The site has no known date-range parameter, so the page itself is fetched whole.
+    """
+    historical_data = None
     try:
-        # Find the historical section by id
-        hist_section = soup.find('div', id='instrument-historie')
-        if not hist_section:
-            logger.warning("Historical section not found")
-            return []
-
-        # Find the table within the section
-        table = hist_section.find('table', class_='kurs-table') or hist_section.find('table')
-        if not table:
-            logger.warning("Table not found in historical section")
-            return []
-
-        # Extract headers
-        headers = [th.text.strip() for th in table.find('thead').find_all('th')]
-        logger.info(f"Found headers: {headers}")
+        page = get_page_http(instrument)
+        with parse_seconds.time():
+            historical_data = parse_history_table(page, watermark)
+    except requests.exceptions.RequestException as e:
+        logger.warning(f"HTTP fetch failed: {e}")
+
+    if historical_data is not None:
+        with fetch_counts_lock:
+            fetch_counts["http"] += 1
+        SCRAPE_FETCHES.labels(method="http").inc()
+        return historical_data
 
-        # Extract rows
-        tbody = table.find('tbody')
-        if not tbody:
-            logger.warning("Table body not found")
+    with fetch_counts_lock:
+        fetch_counts["selenium"] += 1
+        fallbacks = fetch_counts["selenium"]
+        total = fetch_counts["http"] + fallbacks
+    SCRAPE_FETCHES.labels(method="selenium").inc()
+    logger.warning(f"History table of {instrument.isin} not in server HTML, falling back to Selenium "
+                   f"({fallbacks}/{total} fetches, {fallbacks / total:.0%} fallback rate)")
+    page = get_page(instrument)
+    if not page:
+        logger.error("Failed to retrieve page content")
+        return []
+    with parse_seconds.time():
+        return parse_history_table(page, watermark) or []
+
+def scrape_instruments(instruments, watermarks=None, max_workers: int = 4) -> dict:
+    """
+    Scrape several instruments concurrently on a bounded worker pool.
+    Requests to the same host are still spaced out by the shared rate limiter.
+
+    Args:
+        instruments (list): Instrument entries to scrape
+        watermarks (dict): Optional ISIN -> latest stored date, see extract_historical_prices
+        max_workers (int): Maximum number of instruments scraped at the same time
+
+    Returns:
+        dict: ISIN -> list of PriceRow; an instrument that failed maps to an empty list
+    """
+    watermarks = watermarks or {}
+
+    def scrape(instrument):
+        try:
+            return extract_historical_prices(watermarks.get(instrument.isin), instrument)
+        except Exception as e:
+            logger.error(f"Scraping {instrument.isin} failed: {e}")
             return []
 
-        for tr in tbody.find_all('tr'):
-            cells = [td.text.strip() for td in tr.find_all('td')]
-            if len(cells) == len(headers):
-                row = dict(zip(headers, cells))
-                historical_data.append(row)
-            else:
-                logger.warning(f"Skipping row with mismatched columns: {cells}")
-
-        logger.info(f"Extracted {len(historical_data)} rows of historical data")
-        return historical_data
-    except Exception as e:
-        logger.error(f"Error extracting data: {e}")
-        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(instruments))),
+                            thread_name_prefix="scraper") as executor:
+        results = executor.map(scrape, instruments)
+        return {instrument.isin: rows for instrument, rows in zip(instruments, results)}
 
 def main():
     """Main function to run the scraper."""